@@ -187,32 +187,59 @@ app.layout = dbc.Container([
     ])
 ], fluid=True)
 
+def node_element(row):
+    """Elemento de Cytoscape para una burbuja."""
+    return {
+        'data': {
+            'id': row['id_nodo'],
+            'label': row['label'],
+            'size': row['size'],
+            'color': row['color'],
+            'background_color': row['color'], #ejemplo
+            'border_color': '#FFF', #ejemplo
+            'font_size': '20px', #ejemplo
+            'colors': '#000000 #FFFFFF #000000 #FFFFFF #000000 #FFFFFF #000000 #FFFFFF #000000 #FFFFFF' #ejemplo de edge
+        },
+        'position': {'x': row['x'], 'y': row['y']},
+        'classes': 'bubble-node'
+    }
+
+
+def build_period_index(df):
+    """
+    Precalcula los elementos de cada (año, mes) y las opciones de mes de cada año.
+
+    Los datos no cambian mientras corre el servidor, así que se agrupan una sola
+    vez al arrancar y los callbacks solo consultan diccionarios.
+
+    Returns:
+        tuple[dict, dict]: Elementos de Cytoscape por (año, mes) y opciones del
+        desplegable de meses por año.
+    """
+    columnas = ['id_nodo', 'label', 'size', 'color', 'x', 'y']
+    elements_by_period = {
+        (int(year), int(month)): [node_element(row) for row in group[columnas].to_dict('records')]
+        for (year, month), group in df.groupby(['año', 'mes'], sort=False)
+    }
+    month_options_by_year = {
+        int(year): [{'label': str(m), 'value': int(m)} for m in sorted(group.unique())]
+        for year, group in df.groupby('año', sort=False)['mes']
+    }
+    return elements_by_period, month_options_by_year
+
+
+ELEMENTS_BY_PERIOD, MONTH_OPTIONS_BY_YEAR = build_period_index(df)
+
+
 @app.callback(
     Output('bubble-chart', 'elements'),
     [Input('year-dropdown', 'value'),
      Input('month-dropdown', 'value')]
 )
 def update_bubbles(selected_year, selected_month):
-    filtered_df = df[(df['año'] == selected_year) & (df['mes'] == selected_month)]
-
-    elements = []
-    for _, row in filtered_df.iterrows():
-        elements.append({
-            'data': {
-                'id': row['id_nodo'],
-                'label': row['label'],
-                'size': row['size'],
-                'color': row['color'],
-                'background_color': row['color'], #ejemplo
-                'border_color': '#FFF', #ejemplo
-                'font_size': '20px', #ejemplo
-                'colors': '#000000 #FFFFFF #000000 #FFFFFF #000000 #FFFFFF #000000 #FFFFFF #000000 #FFFFFF' #ejemplo de edge
-            },
-            'position': {'x': row['x'], 'y': row['y']},
-            'classes': 'bubble-node'
-        })
-
-    return elements
+    if selected_year is None or selected_month is None:
+        return []
+    return ELEMENTS_BY_PERIOD.get((int(selected_year), int(selected_month)), [])
 
 # Callback para actualizar opciones de meses según año seleccionado
 @app.callback(
@@ -220,8 +247,9 @@ def update_bubbles(selected_year, selected_month):
     Input('year-dropdown', 'value')
 )
 def update_month_dropdown(selected_year):
-    filtered_months = df[df['año'] == selected_year]['mes'].unique()
-    return [{'label': str(m), 'value': m} for m in sorted(filtered_months)]
+    if selected_year is None:
+        return []
+    return MONTH_OPTIONS_BY_YEAR.get(int(selected_year), [])
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -7,6 +7,10 @@ import numpy as np
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
+from gantt import GANTT_DETAIL_LIMIT, build_gantt_figure
+from assistant import PROGRAMS_SCHEMA, ask_stream, collect_chunks
+from intent_router import route_question
+from chat_history import ChatHistory
 
 # --- Cargar variables de entorno desde el archivo .env ---
 load_dotenv()
@@ -115,29 +119,46 @@ if not api_key:
     st.sidebar.warning("Define tu GEMINI_API_KEY en un archivo .env para activar el chat.", icon="⚠️")
 else:
     model = genai.GenerativeModel('gemini-1.5-flash')
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-
-    # Mostrar historial (en la sidebar)
-    for message in st.session_state.messages:
+    if "chat_history" not in st.session_state:
+        st.session_state.chat_history = ChatHistory()
+    historial = st.session_state.chat_history
+
+    # Mostrar historial (en la sidebar): solo los últimos mensajes, los anteriores a petición
+    if historial.hidden_count() and st.sidebar.button(f"Cargar mensajes anteriores ({historial.hidden_count()})"):
+        historial.show_older()
+    for message in historial.visible_messages():
         with st.sidebar.chat_message(message["role"]):
-            st.sidebar.markdown(message["content"])
+            st.markdown(message["content"])
     
     # Input del usuario (en la sidebar)
     if prompt := st.sidebar.chat_input("Pregúntale a los datos..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        
-        datos_contexto = df_filtrado.to_markdown(index=False)
-        prompt_completo = f"Eres un analista de datos experto. Basándote EXCLUSIVAMENTE en los siguientes datos del dashboard:\n\n{datos_contexto}\n\nResponde a la pregunta: \"{prompt}\""
-
-        try:
-            response = model.generate_content(prompt_completo)
-            response_text = response.text
-        except Exception as e:
-            response_text = f"Ocurrió un error: {e}"
+        # Al preguntar algo nuevo la vista vuelve a la última ventana de mensajes
+        historial.reset_view()
+        historial.append("user", prompt)
+        with st.sidebar.chat_message("user"):
+            st.markdown(prompt)
+
+        # La respuesta se muestra a medida que llega, sin volver a ejecutar el dashboard
+        with st.sidebar.chat_message("assistant"):
+            # Los conteos y listados habituales se responden con pandas, sin llamar a la IA
+            response_text = route_question(df_filtrado, prompt, schema=PROGRAMS_SCHEMA)
+            if response_text is not None:
+                st.markdown(response_text)
+            else:
+                fragmentos = []
+                try:
+                    # El prompt lleva un resumen agregado y solo las filas relacionadas con la pregunta
+                    filtros = {'Programa': tuple(programa_seleccionado), 'Estado': tuple(estado_seleccionado)}
+                    st.write_stream(collect_chunks(
+                        ask_stream(model, df_filtrado, prompt, selections=filtros, schema=PROGRAMS_SCHEMA), fragmentos))
+                except Exception as e:
+                    # Lo ya mostrado se conserva en el historial, seguido del error
+                    error = f"Ocurrió un error: {e}"
+                    st.markdown(error)
+                    fragmentos.append(f"\n\n{error}" if fragmentos else error)
+                response_text = "".join(fragmentos)
             
-        st.session_state.messages.append({"role": "assistant", "content": response_text})
-        st.rerun() # Recargar para mostrar el nuevo mensaje
+        historial.append("assistant", response_text)
 
 # --- CUERPO PRINCIPAL DEL DASHBOARD ---
 st.title("🌌 Dashboard Integral de Seguimiento de Programas")
@@ -155,8 +176,15 @@ else:
 
     # SECCIÓN 2: Diagrama de Gantt
     st.header("🗓️ Cronograma de Proyectos (Diagrama de Gantt)")
-    fig_gantt = px.timeline(df_filtrado, x_start="Fecha Inicio", x_end="Fecha Límite", y="Actividad", color="Programa", title="Línea de Tiempo por Actividad", template="plotly_dark")
-    fig_gantt.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+    # Con muchas actividades el Gantt se resume por Programa; el selector permite ver el detalle de uno
+    df_gantt, grupo_gantt = df_filtrado, 'Programa'
+    if len(df_filtrado) > GANTT_DETAIL_LIMIT:
+        programas_gantt = sorted(df_filtrado['Programa'].dropna().unique())
+        detalle_gantt = st.selectbox("Nivel de detalle del Gantt", ["Resumen por Programa"] + programas_gantt, key="gantt_detalle")
+        if detalle_gantt != "Resumen por Programa":
+            df_gantt, grupo_gantt = df_filtrado[df_filtrado['Programa'] == detalle_gantt], None
+    fig_gantt = build_gantt_figure(df_gantt, start="Fecha Inicio", end="Fecha Límite", label="Actividad", color="Programa", group=grupo_gantt, title="Línea de Tiempo por Actividad", hover_data=['Estado'])
+    fig_gantt.update_layout(template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
     fig_gantt.update_yaxes(categoryorder='total ascending')
     st.plotly_chart(fig_gantt, use_container_width=True)
     st.divider()
@@ -0,0 +1,310 @@
+import os
+import re
+import unicodedata
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from caching import LRUCache
+from response_cache import ResponseCache
+
+# Presupuesto aproximado de tokens para los datos que acompañan cada pregunta
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("ASSISTANT_CONTEXT_TOKENS", 4000))
+# Estimación conservadora para texto en español
+_CHARS_PER_TOKEN = 4
+# Máximo de valores por agrupación y de tareas vencidas que se listan en el resumen
+_MAX_GROUP_VALUES = 15
+_MAX_OVERDUE = 20
+
+# Contextos ya serializados, por (versión de datos, filtros, esquema, palabras clave, presupuesto, día)
+_context_cache = LRUCache(maxsize=128)
+# Texto normalizado de cada fila para la búsqueda por palabras clave, por (versión, filtros, esquema)
+_search_cache = LRUCache(maxsize=16)
+# Respuestas del modelo, por (pregunta normalizada, modelo, huella del contexto)
+response_cache = ResponseCache()
+
+_STOPWORDS = {
+    "que", "cual", "cuales", "como", "cuando", "donde", "quien", "quienes", "cuanto", "cuantos", "cuantas",
+    "los", "las", "del", "por", "para", "con", "sin", "una", "uno", "unos", "unas", "hay", "estan", "esta",
+    "este", "estos", "estas", "son", "sus", "mis", "tus", "todas", "todos", "tiene", "tienen", "tareas",
+    "tarea", "actividades", "actividad", "dame", "dime", "lista", "muestra", "sobre", "entre",
+}
+
+
+class ContextSchema(NamedTuple):
+    """Columnas de la tabla que usa el constructor de contexto."""
+    name_column: str
+    due_column: str
+    group_columns: tuple
+    done_column: str
+    done_value: object # Valor de 'hecho'; si es numérico, se considera hecho lo que lo alcance
+
+
+# Plan de tareas de los dashboards de proyecto
+TASKS_SCHEMA = ContextSchema('Hito/Actividad', 'Fecha de fin', ('Estado', 'Etapa', 'Responsable'), 'Estado', 'CUMPLIDA')
+# Seguimiento de programas de `app_on_streamlit.py`
+PROGRAMS_SCHEMA = ContextSchema('Actividad', 'Fecha Límite', ('Estado', 'Programa'), 'Porcentaje Ejecución', 100)
+
+
+def estimate_tokens(text):
+    """Estimación rápida del número de tokens de un texto."""
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def normalize_text(text):
+    """Minúsculas y sin tildes, para comparar palabras."""
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def question_keywords(question):
+    """
+    Extrae las palabras clave de una pregunta.
+
+    Returns:
+        tuple[str, ...]: Palabras normalizadas de al menos 3 letras, en singular y
+        sin palabras vacías ni repetidas.
+    """
+    palabras = [p for p in re.findall(r"\w+", normalize_text(question)) if len(p) >= 3 and p not in _STOPWORDS]
+    # Plural simple: "atrasadas" también debe encontrar "ATRASADA"
+    return tuple(dict.fromkeys(p[:-1] if len(p) > 4 and p.endswith('s') else p for p in palabras))
+
+
+def pending_mask(df, schema):
+    """Máscara booleana (array de NumPy) de las filas sin completar según el esquema."""
+    estado = df[schema.done_column]
+    if isinstance(schema.done_value, (int, float)):
+        return (estado < schema.done_value).to_numpy()
+    return (estado != schema.done_value).to_numpy()
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d') if pd.notna(value) else "sin fecha"
+
+
+def _row_line(row, columns):
+    return " | ".join(_format_date(v) if isinstance(v, pd.Timestamp) else str(v) for v in (row[c] for c in columns))
+
+
+def summarize_tasks(df, schema=TASKS_SCHEMA, reference_date=None):
+    """
+    Resume la tabla en conteos agregados y la lista de tareas vencidas.
+
+    Args:
+        df (pd.DataFrame): La tabla (normalmente ya filtrada).
+        schema (ContextSchema): Columnas a usar.
+        reference_date (datetime, optional): Fecha para decidir qué está vencido; por defecto, hoy.
+
+    Returns:
+        str: El resumen en texto.
+    """
+    hoy = pd.Timestamp.now().normalize() if reference_date is None else pd.Timestamp(reference_date)
+    lineas = [f"Total de registros: {len(df)}"]
+    for columna in schema.group_columns:
+        if columna not in df.columns:
+            continue
+        conteos = df[columna].value_counts()
+        conteos = conteos[conteos > 0]
+        valores = ", ".join(f"{valor}: {n}" for valor, n in conteos.head(_MAX_GROUP_VALUES).items())
+        resto = len(conteos) - _MAX_GROUP_VALUES
+        lineas.append(f"Por {columna}: {valores}" + (f" (y {resto} más)" if resto > 0 else ""))
+
+    vencidas = df[pending_mask(df, schema) & (df[schema.due_column] < hoy).to_numpy()]
+    vencidas = vencidas.sort_values(schema.due_column, kind='stable')
+    lineas.append(f"Vencidas (sin completar, con fecha de fin anterior a {_format_date(hoy)}): {len(vencidas)}")
+    columnas = [schema.name_column, schema.due_column, *[c for c in schema.group_columns if c in df.columns]]
+    for _, fila in vencidas.head(_MAX_OVERDUE).iterrows():
+        lineas.append(f"- {_row_line(fila, columnas)}")
+    if len(vencidas) > _MAX_OVERDUE:
+        lineas.append(f"- ... y {len(vencidas) - _MAX_OVERDUE} vencidas más")
+    return "\n".join(lineas)
+
+
+def _search_text(df, schema, cache_key=None):
+    texto = _search_cache.get(cache_key) if cache_key is not None else None
+    if texto is None:
+        columnas = [schema.name_column, *[c for c in schema.group_columns if c in df.columns]]
+        texto = df[columnas[0]].astype(str)
+        for columna in columnas[1:]:
+            texto = texto + " " + df[columna].astype(str)
+        texto = pd.Series([normalize_text(t) for t in texto], index=df.index)
+        if cache_key is not None:
+            _search_cache.set(cache_key, texto)
+    return texto
+
+
+def relevant_rows(df, keywords, schema=TASKS_SCHEMA, search_text=None):
+    """
+    Selecciona las filas que mencionan las palabras clave de la pregunta.
+
+    Args:
+        df (pd.DataFrame): La tabla.
+        keywords (tuple[str, ...]): Palabras de `question_keywords`.
+        schema (ContextSchema): Columnas a usar.
+        search_text (pd.Series, optional): Texto normalizado de cada fila, si ya se calculó.
+
+    Returns:
+        pd.DataFrame: Las filas con alguna coincidencia, de más a menos coincidencias
+        y, a igualdad, por fecha de fin.
+    """
+    if not keywords or df.empty:
+        return df.iloc[:0]
+    if search_text is None:
+        search_text = _search_text(df, schema)
+    puntajes = np.zeros(len(df), dtype=np.int32)
+    for palabra in keywords:
+        puntajes += search_text.str.contains(palabra, regex=False).to_numpy()
+    coinciden = np.flatnonzero(puntajes)
+    if not len(coinciden):
+        return df.iloc[:0]
+    fin = df[schema.due_column].to_numpy()[coinciden]
+    orden = np.lexsort((fin, -puntajes[coinciden]))
+    return df.iloc[coinciden[orden]]
+
+
+def build_context(df, question, data_version=None, selections=None, schema=TASKS_SCHEMA,
+                  token_budget=CONTEXT_TOKEN_BUDGET, reference_date=None):
+    """
+    Construye el contexto de datos de una pregunta sin superar el presupuesto de tokens.
+
+    El contexto tiene un resumen agregado (conteos por estado, etapa y
+    responsable, y tareas vencidas) y, si la pregunta menciona algo de la
+    tabla, las filas relevantes encontradas por palabras clave, hasta agotar el
+    presupuesto. El resultado se guarda en caché por versión de datos y filtros.
+
+    Args:
+        df (pd.DataFrame): La tabla ya filtrada.
+        question (str): La pregunta del usuario.
+        data_version (str, optional): Versión de los datos; si falta se usa un hash de la tabla.
+        selections (dict, optional): Filtros aplicados para obtener `df`.
+        schema (ContextSchema): Columnas a usar.
+        token_budget (int): Máximo aproximado de tokens del contexto.
+        reference_date (datetime, optional): Fecha para decidir qué está vencido; por defecto, hoy.
+
+    Returns:
+        str: El contexto listo para incluir en el prompt.
+    """
+    if data_version is None:
+        data_version = int(pd.util.hash_pandas_object(df, index=True).sum())
+    hoy = pd.Timestamp.now().normalize() if reference_date is None else pd.Timestamp(reference_date)
+    base_key = (data_version, tuple(sorted((selections or {}).items())), schema)
+    keywords = question_keywords(question)
+    key = (*base_key, keywords, token_budget, hoy)
+    contexto = _context_cache.get(key)
+    if contexto is not None:
+        return contexto
+
+    # Presupuesto en caracteres; cada parte cuesta su longitud más el salto de línea que la separa
+    presupuesto = token_budget * _CHARS_PER_TOKEN
+    titulo = "## Resumen de los datos"
+    resumen = summarize_tasks(df, schema, hoy)[:max(presupuesto - len(titulo) - 1, 0)]
+    partes = [titulo, resumen]
+    usados = len(titulo) + 1 + len(resumen)
+
+    filas = relevant_rows(df, keywords, schema, _search_text(df, schema, base_key))
+    if len(filas):
+        columnas = [c for c in df.columns if c in (schema.name_column, schema.due_column, *schema.group_columns)]
+        encabezado = f"## Registros relacionados con la pregunta ({len(filas)})\n" + " | ".join(columnas)
+        if usados + 1 + len(encabezado) <= presupuesto:
+            partes.append(encabezado)
+            usados += 1 + len(encabezado)
+            incluidas = 0
+            for _, fila in filas.iterrows():
+                linea = _row_line(fila, columnas)
+                if usados + 1 + len(linea) > presupuesto:
+                    break
+                partes.append(linea)
+                usados += 1 + len(linea)
+                incluidas += 1
+            # El aviso de filas omitidas también cabe en el presupuesto: se le hace sitio quitando filas
+            while incluidas < len(filas):
+                aviso = f"... ({len(filas) - incluidas} registros más no incluidos por límite de espacio)"
+                if usados + 1 + len(aviso) <= presupuesto or not incluidas:
+                    partes.append(aviso)
+                    break
+                usados -= 1 + len(partes.pop())
+                incluidas -= 1
+
+    contexto = "\n".join(partes)
+    _context_cache.set(key, contexto)
+    return contexto
+
+
+def build_prompt(context, question):
+    """Arma el prompt para el modelo con el contexto de datos y la pregunta."""
+    return f"""Eres un analista de datos experto y amigable. Tu única fuente de información son los siguientes datos extraídos de un dashboard de proyectos. No puedes usar información externa.
+
+**Datos Actuales del Dashboard:**
+{context}
+
+**Pregunta del Usuario:**
+"{question}"
+
+Basándote EXCLUSIVAMENTE en los datos proporcionados, responde a la pregunta del usuario. Si la respuesta no está en los datos, indícalo amablemente."""
+
+
+def _model_name(model):
+    return getattr(model, "model_name", type(model).__name__)
+
+
+def _chunk_text(chunk):
+    # Gemini lanza ValueError al leer `.text` de un fragmento sin texto (p. ej. el de cierre)
+    try:
+        return chunk.text or ""
+    except ValueError:
+        return ""
+
+
+def ask_stream(model, df, question, data_version=None, selections=None, schema=TASKS_SCHEMA,
+               token_budget=CONTEXT_TOKEN_BUDGET, cache=response_cache):
+    """
+    Responde una pregunta sobre la tabla con un modelo generativo, por fragmentos.
+
+    Pensado para `st.write_stream`: el primer fragmento se muestra en cuanto
+    llega, sin esperar a la respuesta completa. Si la misma pregunta
+    (normalizada) ya se respondió con el mismo modelo y los mismos datos de
+    contexto, la respuesta guardada se entrega de una vez sin llamar al
+    modelo; si no, se guarda al terminar el streaming (una respuesta
+    interrumpida no se guarda).
+
+    Args:
+        model: Objeto con un método `generate_content(prompt, stream=True)` que
+            devuelve un iterable de fragmentos con `.text`.
+        df (pd.DataFrame): La tabla ya filtrada.
+        question (str): La pregunta del usuario.
+        data_version (str, optional): Versión de los datos.
+        selections (dict, optional): Filtros aplicados para obtener `df`.
+        schema (ContextSchema): Columnas a usar.
+        token_budget (int): Máximo aproximado de tokens del contexto.
+        cache (ResponseCache | None): Caché de respuestas; None para no usarla.
+
+    Yields:
+        str: Fragmentos de la respuesta.
+    """
+    contexto = build_context(df, question, data_version, selections, schema, token_budget)
+    if cache is not None:
+        respuesta = cache.get(question, _model_name(model), contexto)
+        if respuesta is not None:
+            yield respuesta
+            return
+    fragmentos = []
+    for chunk in model.generate_content(build_prompt(contexto, question), stream=True):
+        texto = _chunk_text(chunk)
+        if texto:
+            fragmentos.append(texto)
+            yield texto
+    if cache is not None and fragmentos:
+        cache.set(question, _model_name(model), contexto, "".join(fragmentos))
+
+
+def collect_chunks(chunks, collected):
+    """
+    Reenvía los fragmentos de un stream y los va añadiendo a `collected`.
+
+    Si el stream falla a mitad, `collected` conserva lo que ya se mostró, para
+    guardarlo en el historial junto con el error.
+    """
+    for chunk in chunks:
+        collected.append(chunk)
+        yield chunk
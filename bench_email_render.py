@@ -0,0 +1,69 @@
+"""
+Micro-benchmark del renderizado de correos de recordatorio.
+
+Mide cuántos mensajes por segundo se construyen con `build_reminder_message`
+y `build_digest_message`, y los compara con el armado clásico de un
+`MIMEMultipart` con `as_string()` sobre el mismo HTML.
+
+Uso:
+    python bench_email_render.py [número de mensajes]
+"""
+import datetime
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from email_sender import build_digest_message, build_reminder_message, render_reminder_html
+
+SENDER = "gestor@example.com"
+
+
+def _sample_reminders(n):
+    hoy = datetime.datetime(2024, 1, 1)
+    return [
+        (f"persona{i % 50}@example.com", f"Actividad {i}", f"Responsable {i % 50}",
+         hoy + datetime.timedelta(days=i % 90))
+        for i in range(n)
+    ]
+
+
+def _mime_multipart_message(receiver_email, task_name, responsible_name, due_date):
+    """Referencia: el mismo correo armado con MIMEMultipart y as_string()."""
+    message = MIMEMultipart()
+    message["Subject"] = f"Recordatorio: Tarea Pendiente - {task_name}"
+    message["From"] = f"Gestor de Proyectos <{SENDER}>"
+    message["To"] = receiver_email
+    message.attach(MIMEText(render_reminder_html(task_name, responsible_name, due_date), "html"))
+    return message.as_string()
+
+
+def _measure(label, build, samples):
+    start = time.perf_counter()
+    for args in samples:
+        build(*args)
+    elapsed = time.perf_counter() - start
+    rate = len(samples) / elapsed
+    print(f"{label:<32} {len(samples):>7} mensajes en {elapsed:7.3f} s  ->  {rate:10.0f} mensajes/s")
+    return rate
+
+
+def main(n=5000):
+    samples = _sample_reminders(n)
+    reminder_args = [(SENDER, *sample) for sample in samples]
+    digest_args = [
+        (SENDER, receiver, responsible, [{"task_name": task, "due_date": due, "overdue": False}] * 5)
+        for receiver, task, responsible, due in samples
+    ]
+
+    # Calentamiento de las cachés de plantilla y fechas
+    build_reminder_message(*reminder_args[0])
+
+    baseline = _measure("MIMEMultipart + as_string()", _mime_multipart_message, samples)
+    fast = _measure("build_reminder_message", build_reminder_message, reminder_args)
+    _measure("build_digest_message (5 tareas)", build_digest_message, digest_args)
+    print(f"Aceleración del recordatorio: x{fast / baseline:.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,91 @@
+import collections
+import itertools
+import json
+import os
+import zlib
+
+# Mensajes que se muestran en cada rerun (y cuántos más se cargan con "Cargar anteriores")
+CHAT_WINDOW = int(os.environ.get("ASSISTANT_CHAT_WINDOW", 20))
+# Máximo de mensajes archivados por sesión; los más antiguos se descartan
+CHAT_MAX_ARCHIVED = int(os.environ.get("ASSISTANT_CHAT_MAX_ARCHIVED", 1000))
+
+
+def _pack(messages):
+    return zlib.compress(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+
+
+def _unpack(block):
+    return json.loads(zlib.decompress(block).decode("utf-8"))
+
+
+class ChatHistory:
+    """
+    Historial del chat acotado para guardar en `st.session_state`.
+
+    Solo los mensajes recientes (hasta dos ventanas) se guardan tal cual; los
+    anteriores se archivan en bloques comprimidos de una ventana y, pasado
+    `max_archived`, se descartan. La vista muestra las últimas `window`
+    entradas y se amplía una ventana cada vez que el usuario pide los
+    mensajes anteriores, de modo que el coste de cada rerun no crece con la
+    duración de la sesión.
+
+    Args:
+        window (int): Mensajes visibles por defecto y tamaño de cada bloque archivado.
+        max_archived (int): Máximo de mensajes archivados que se conservan.
+    """
+
+    def __init__(self, window=CHAT_WINDOW, max_archived=CHAT_MAX_ARCHIVED):
+        self.window = window
+        self.max_archived = max_archived
+        self._recent = collections.deque()
+        self._archive = collections.deque() # (número de mensajes, bloque comprimido), del más antiguo al más reciente
+        self._archived = 0
+        self.dropped = 0
+        self._visible = window
+
+    def __len__(self):
+        return self._archived + len(self._recent)
+
+    def append(self, role, content):
+        """Añade un mensaje y archiva los más antiguos si se supera el límite en memoria."""
+        self._recent.append({"role": role, "content": content})
+        if len(self._recent) > 2 * self.window:
+            bloque = [self._recent.popleft() for _ in range(self.window)]
+            self._archive.append((len(bloque), _pack(bloque)))
+            self._archived += len(bloque)
+        while self._archived > self.max_archived:
+            n, _ = self._archive.popleft()
+            self._archived -= n
+            self.dropped += n
+
+    def hidden_count(self):
+        """Número de mensajes guardados que la vista actual no muestra."""
+        return max(len(self) - self._visible, 0)
+
+    def show_older(self):
+        """Amplía la vista una ventana más hacia atrás."""
+        self._visible = min(self._visible + self.window, len(self))
+
+    def reset_view(self):
+        """Vuelve a mostrar solo la última ventana."""
+        self._visible = self.window
+
+    def visible_messages(self):
+        """
+        Mensajes a dibujar, del más antiguo al más reciente.
+
+        Solo se descomprimen los bloques archivados que la vista alcanza.
+
+        Returns:
+            list[dict]: Mensajes con las claves 'role' y 'content'.
+        """
+        faltan = self._visible - len(self._recent)
+        if faltan <= 0:
+            return list(itertools.islice(self._recent, len(self._recent) - self._visible, None))
+        anteriores = []
+        for n, bloque in reversed(self._archive):
+            if faltan <= 0:
+                break
+            anteriores = _unpack(bloque) + anteriores
+            faltan -= n
+        return anteriores[max(-faltan, 0):] + list(self._recent)
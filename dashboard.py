@@ -1,14 +1,20 @@
 # 1. Importar las librerías necesarias
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import warnings
 import os
 import google.generativeai as genai
-from datetime import datetime, timedelta
-import random
+from datetime import datetime
 import numpy as np
-from email_sender import send_task_reminder_email
+from email_outbox import FAILED, PENDING, SENT, EmailOutbox
+from reminder_ledger import RETRYING, ReminderLedger, task_keys
+from task_table import build_filter_index, compact_tasks, filter_options, select_tasks
+from metrics import key_metrics
+from reminder_digest import build_digests
+from kanban import bucket_pending_tasks, group_positions, render_cards_html
+from gantt import GANTT_DETAIL_LIMIT, gantt_figure
+from data_loader import STREAMING_THRESHOLD_BYTES, file_digest, load_project_file
+from task_store import TaskStore
 
 # Ignorar advertencias futuras que puedan surgir de las librerías
 warnings.simplefilter(action='ignore', category=FutureWarning)
@@ -18,39 +24,94 @@ st.set_page_config(page_title="Dashboard de gestion DATIC", page_icon="🚀", la
 
 # --- FUNCIONES AUXILIARES ---
 
-def generate_fake_data(df):
-    """Añade columnas de prioridad y bloqueos con datos de ejemplo al DataFrame."""
+def generate_fake_data(df, seed=None):
+    """
+    Añade columnas de prioridad y bloqueos con datos de ejemplo al DataFrame.
+
+    Args:
+        df (pd.DataFrame): La tabla de tareas.
+        seed (int, optional): Semilla del generador. Con la misma semilla y el mismo
+            archivo se obtienen siempre los mismos datos de ejemplo.
+
+    Returns:
+        pd.DataFrame: El DataFrame con las columnas 'Prioridad', 'Bloqueada por' y 'Bloquea a'.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(df)
+
     if 'Prioridad' not in df.columns:
         prioridades = ['Alta', 'Media', 'Baja']
-        df['Prioridad'] = [random.choice(prioridades) for _ in range(len(df))]
+        df['Prioridad'] = pd.Categorical.from_codes(rng.integers(0, len(prioridades), n), categories=prioridades)
 
     if 'Bloqueada por' not in df.columns:
-        actividades = df['Hito/Actividad'].tolist()
         bloqueantes_posibles = [
             'Falta de aprobación del cliente',
             'Recursos técnicos no disponibles',
             'Dependencia de otra tarea',
             'Esperando feedback del equipo de diseño',
             'Presupuesto pendiente de aprobación',
-            None, None, None, None, None # Hacemos que 'None' sea más probable
         ]
-        df['Bloqueada por'] = [random.choice(bloqueantes_posibles) if random.random() < 0.3 else None for _ in range(len(df))]
+        # El 30% de las tareas sortea un motivo entre 10 opciones, la mitad de ellas 'None'
+        codigos = rng.integers(0, 2 * len(bloqueantes_posibles), n)
+        codigos[(codigos >= len(bloqueantes_posibles)) | (rng.random(n) >= 0.3)] = -1
+        df['Bloqueada por'] = pd.Categorical.from_codes(codigos, categories=bloqueantes_posibles)
 
     if 'Bloquea a' not in df.columns:
-        df['Bloquea a'] = [random.choice(actividades) if random.random() < 0.2 else None for _ in range(len(df))]
+        actividades = df['Hito/Actividad'].to_numpy(dtype=object)
+        bloquea_a = np.full(n, None, dtype=object)
+        elegidas = np.flatnonzero(rng.random(n) < 0.2)
+        candidatas = actividades[rng.integers(0, n, len(elegidas))] if n else actividades[:0]
         # Asegurarse de que una tarea no se bloquee a sí misma
-        df['Bloquea a'] = np.where(df['Bloquea a'] == df['Hito/Actividad'], None, df['Bloquea a'])
+        validas = candidatas != actividades[elegidas]
+        bloquea_a[elegidas[validas]] = candidatas[validas]
+        df['Bloquea a'] = pd.Series(bloquea_a, index=df.index, dtype=object)
 
     return df
 
-def get_priority_color(priority):
-    """Devuelve un color basado en la prioridad."""
-    if priority == 'Alta':
-        return '#FF4B4B' # Rojo
-    elif priority == 'Media':
-        return '#FFD43B' # Amarillo
-    else:
-        return '#3D9970' # Verde
+@st.cache_resource(max_entries=32)
+def get_task_store(dataset):
+    """Almacén de un plan, compartido por las sesiones que suben el mismo archivo."""
+    return TaskStore(dataset)
+
+@st.cache_resource
+def get_ledger():
+    """Registro persistente de recordatorios por tarea, compartido por todas las sesiones."""
+    return ReminderLedger()
+
+@st.cache_resource
+def get_outbox():
+    """Cola de correos en segundo plano, compartida por todas las sesiones del servidor."""
+    outbox = EmailOutbox(on_status=get_ledger().record)
+    outbox.start()
+    return outbox
+
+def build_reminders(df, claves):
+    """Convierte las tareas de un DataFrame en recordatorios para la cola de correos."""
+    return [
+        {"receiver_email": email, "task_name": tarea, "responsible_name": responsable,
+         "due_date": fecha_fin, "task_key": int(clave)}
+        for email, tarea, responsable, fecha_fin, clave in zip(
+            df['Email'], df['Hito/Actividad'], df['Responsable'], df['Fecha de fin'], claves)
+    ]
+
+def enqueue_reminders(df, claves):
+    """Registra los recordatorios de las tareas como pendientes y los encola."""
+    reminders = build_reminders(df, claves)
+    # Se registran antes de encolar: así el 'sent' de un envío rápido nunca queda pisado por 'pending'
+    get_ledger().record(reminders, [PENDING] * len(reminders))
+    return get_outbox().enqueue(reminders)
+
+# --- CONFIGURACIÓN DEL KANBAN ---
+# (clave del horizonte, título de la columna, texto del botón de detalle)
+KANBAN_COLUMNS = [
+    ('Hoy', "HOY", "Ver Tareas de Hoy"),
+    ('Semana', "ESTA SEMANA", "Ver Tareas de la Semana"),
+    ('Quincena', "ESTA QUINCENA", "Ver Tareas de la Quincena"),
+    ('Mes', "ESTE MES", "Ver Tareas del Mes"),
+]
+KANBAN_PAGE_SIZE = 20 # Tarjetas por columna antes de "Mostrar más"
+DETAIL_PAGE_SIZES = [10, 25, 50] # Opciones de tareas por página en la vista detallada
+DEFAULT_EMAIL = 'jferia@mintic.gov.co' # Correo de ejemplo para el MVP cuando el plan no trae 'Email'
 
 # --- ESTILOS CSS PARA EL KANBAN ---
 st.markdown("""
@@ -102,10 +163,18 @@ except ImportError:
 # --- INICIALIZACIÓN DE SESSION STATE ---
 if 'df' not in st.session_state:
     st.session_state.df = None
+if 'source_digest' not in st.session_state:
+    st.session_state.source_digest = None # Huella del archivo cargado actualmente
+if 'data_version' not in st.session_state:
+    st.session_state.data_version = None # Versión de los datos en memoria (cambia al cargar o editar)
+if 'filter_options' not in st.session_state:
+    st.session_state.filter_options = {} # Valores únicos precalculados para los filtros
+if 'filter_index' not in st.session_state:
+    st.session_state.filter_index = {} # Índice invertido valor -> posiciones de filas
 if 'kanban_view' not in st.session_state:
     st.session_state.kanban_view = None # Opciones: 'Hoy', 'Semana', 'Quincena', 'Mes'
-if 'reminders_sent' not in st.session_state:
-    st.session_state.reminders_sent = {} # Usaremos un diccionario para rastrear por índice de tarea
+if 'kanban_limits' not in st.session_state:
+    st.session_state.kanban_limits = {} # Tarjetas visibles por columna del Kanban
 
 
 # --- BARRA LATERAL (SIDEBAR) ---
@@ -115,45 +184,70 @@ with st.sidebar:
 
     if uploaded_file:
         try:
-            df_cargado = pd.read_excel(uploaded_file)
-            required_cols = ['Hito/Actividad', 'Fecha de inicio', 'Fecha de fin', 'Etapa', 'Responsable', 'Estado']
-            
-            for col in required_cols:
-                if col in df_cargado.columns and df_cargado[col].dtype == 'object':
-                    df_cargado[col] = df_cargado[col].str.strip()
-            
-            df_cargado['Fecha de inicio'] = pd.to_datetime(df_cargado['Fecha de inicio'], errors='coerce')
-            df_cargado['Fecha de fin'] = pd.to_datetime(df_cargado['Fecha de fin'], errors='coerce')
-            
-            # Generar datos de ejemplo para prioridad y bloqueos
-            df_cargado = generate_fake_data(df_cargado)
-
-            st.session_state.df = df_cargado.dropna(subset=['Fecha de inicio', 'Fecha de fin'])
+            file_bytes = uploaded_file.getvalue()
+            huella = file_digest(file_bytes)
+
+            # Solo se procesa el archivo cuando cambia su contenido, no en cada rerun.
+            # Cada archivo tiene su propio plan en el almacén: si otra sesión ya subió
+            # este mismo archivo, no se vuelve a leer y se conservan sus ediciones
+            tienda = get_task_store(huella)
+            if tienda.version() is None:
+                if len(file_bytes) > STREAMING_THRESHOLD_BYTES:
+                    # Planes muy grandes: lectura por bloques con barra de progreso
+                    barra_progreso = st.progress(0, text="Leyendo archivo...")
+
+                    def actualizar_progreso(filas_leidas, filas_totales):
+                        avance = min(filas_leidas / filas_totales, 1.0) if filas_totales else 0
+                        barra_progreso.progress(avance, text=f"Leyendo archivo... {filas_leidas:,} filas")
+
+                    df_cargado = load_project_file(file_bytes, digest=huella, streaming=True,
+                                                   progress_callback=actualizar_progreso)
+                    barra_progreso.empty()
+                else:
+                    df_cargado = load_project_file(file_bytes, digest=huella)
+                tienda.ingest(df_cargado)
+            st.session_state.source_digest = huella
             st.success("Archivo cargado y procesado.", icon="✅")
         except Exception as e:
+            # La sesión sigue con el plan que tenía; el archivo se reintenta en el
+            # siguiente rerun porque su plan no llegó a guardarse
             st.error(f"Error al procesar el archivo: {e}")
-            st.session_state.df = None
+
+    # El plan de esta sesión se lee cuando cambia su versión: al subir un archivo o
+    # cuando otra sesión que trabaja con el mismo archivo guarda cambios
+    tienda = get_task_store(st.session_state.source_digest) if st.session_state.source_digest else None
+    version_tienda = tienda.version() if tienda is not None else None
+    if version_tienda is not None and version_tienda != st.session_state.data_version:
+        # Generar datos de ejemplo para prioridad y bloqueos
+        # La semilla sale de la huella del archivo: el mismo plan da los mismos datos de ejemplo
+        semilla = int(tienda.dataset[:16], 16)
+        st.session_state.df = compact_tasks(generate_fake_data(tienda.load(), seed=semilla))
+        st.session_state.filter_options = filter_options(st.session_state.df)
+        st.session_state.filter_index = build_filter_index(st.session_state.df)
+        st.session_state.data_version = version_tienda
 
     if st.session_state.df is not None:
         df_display = st.session_state.df
         st.divider()
         st.header("2. Filtros del Dashboard")
-        etapas_unicas = df_display['Etapa'].dropna().unique().tolist()
-        responsables_unicos = df_display['Responsable'].dropna().unique().tolist()
-        estados_unicos = df_display['Estado'].dropna().unique().tolist()
+        opciones = st.session_state.filter_options
+        etapas_unicas = opciones.get('Etapa', [])
+        responsables_unicos = opciones.get('Responsable', [])
+        estados_unicos = opciones.get('Estado', [])
 
         selected_etapa = st.selectbox("Filtrar por Etapa:", ["Todas"] + etapas_unicas)
         selected_responsable = st.selectbox("Filtrar por Responsable:", ["Todos"] + responsables_unicos)
         selected_estado = st.selectbox("Filtrar por Estado:", ["Todos"] + estados_unicos)
         
-        df_filtrado = df_display.copy()
-        if selected_etapa != "Todas":
-            df_filtrado = df_filtrado[df_filtrado['Etapa'] == selected_etapa]
-        if selected_responsable != "Todos":
-            df_filtrado = df_filtrado[df_filtrado['Responsable'] == selected_responsable]
-        if selected_estado != "Todos":
-            df_filtrado = df_filtrado[df_filtrado['Estado'] == selected_estado]
+        # Aplicación de filtros: intersección de las posiciones precalculadas
+        filtros = {
+            'Etapa': None if selected_etapa == "Todas" else selected_etapa,
+            'Responsable': None if selected_responsable == "Todos" else selected_responsable,
+            'Estado': None if selected_estado == "Todos" else selected_estado,
+        }
+        df_filtrado = select_tasks(df_display, st.session_state.filter_index, filtros)
     else:
+        filtros = {}
         df_filtrado = pd.DataFrame()
 
     st.divider()
@@ -174,21 +268,17 @@ if st.session_state.df is None:
 # --- SECCIÓN DE MÉTRICAS CLAVE (AMPLIADA) ---
 st.header("📊 Métricas Clave del Proyecto")
 if not df_filtrado.empty:
-    hoy = datetime.now()
-    total_actividades = len(df_filtrado)
-    por_comenzar = df_filtrado[df_filtrado['Estado'] == 'POR COMENZAR'].shape[0]
-    en_proceso = df_filtrado[df_filtrado['Estado'] == 'A TIEMPO'].shape[0]
-    bloqueadas = df_filtrado['Bloqueada por'].notna().sum()
-    no_bloqueadas = total_actividades - bloqueadas
-    vencidas = df_filtrado[(df_filtrado['Fecha de fin'] < hoy) & (df_filtrado['Estado'] != 'CUMPLIDA')].shape[0]
+    # Redondeamos al minuto para que los reruns dentro del mismo minuto reutilicen el resultado
+    hoy = pd.Timestamp.now().floor('min')
+    metricas = key_metrics(df_filtrado, st.session_state.data_version, filtros, hoy)
 
     col1, col2, col3, col4, col5, col6 = st.columns(6)
-    col1.metric("Total Tareas", f"{total_actividades} 📝")
-    col2.metric("Por Empezar", f"{por_comenzar} ⏳")
-    col3.metric("En Proceso", f"{en_proceso} 🏃‍♂️")
-    col4.metric("Bloqueadas", f"{bloqueadas} 🛑")
-    col5.metric("No Bloqueadas", f"{no_bloqueadas} ✅")
-    col6.metric("Vencidas", f"{vencidas} 🚨", delta=f"{vencidas} tarea(s)", delta_color="inverse")
+    col1.metric("Total Tareas", f"{metricas.total} 📝")
+    col2.metric("Por Empezar", f"{metricas.por_comenzar} ⏳")
+    col3.metric("En Proceso", f"{metricas.en_proceso} 🏃‍♂️")
+    col4.metric("Bloqueadas", f"{metricas.bloqueadas} 🛑")
+    col5.metric("No Bloqueadas", f"{metricas.no_bloqueadas} ✅")
+    col6.metric("Vencidas", f"{metricas.vencidas} 🚨", delta=f"{metricas.vencidas} tarea(s)", delta_color="inverse")
 else:
     st.warning("No hay actividades que coincidan con los filtros seleccionados.")
 
@@ -197,85 +287,49 @@ st.divider()
 # --- KANBAN DE TAREAS PRIORITARIAS ---
 st.header("📌 Kanban de Tareas Prioritarias")
 if not df_filtrado.empty:
-    # CORRECCIÓN: Usar .replace() para obtener el inicio del día (medianoche)
-    hoy_norm = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    fin_semana = hoy_norm + timedelta(days=7 - hoy_norm.weekday())
-    fin_quincena = hoy_norm + timedelta(days=15)
-    fin_mes = hoy_norm + timedelta(days=30)
-
-    # Filtrar tareas que no están cumplidas
-    df_kanban = df_filtrado[df_filtrado['Estado'] != 'CUMPLIDA'].copy()
-
-    tareas_hoy = df_kanban[df_kanban['Fecha de fin'].dt.date == hoy_norm.date()]
-    tareas_semana = df_kanban[(df_kanban['Fecha de fin'] > hoy_norm) & (df_kanban['Fecha de fin'] <= fin_semana)]
-    tareas_quincena = df_kanban[(df_kanban['Fecha de fin'] > fin_semana) & (df_kanban['Fecha de fin'] <= fin_quincena)]
-    tareas_mes = df_kanban[(df_kanban['Fecha de fin'] > fin_quincena) & (df_kanban['Fecha de fin'] <= fin_mes)]
-
-    k_col1, k_col2, k_col3, k_col4 = st.columns(4)
-
-    with k_col1:
-        st.subheader(f"HOY ({len(tareas_hoy)})")
-        if st.button("Ver Tareas de Hoy", key="btn_hoy", use_container_width=True):
-            st.session_state.kanban_view = 'Hoy'
-        for _, row in tareas_hoy.iterrows():
-            color = get_priority_color(row['Prioridad'])
-            st.markdown(f"""
-            <div class="kanban-card">
-                <div class="kanban-card-title"><span class="priority-dot" style="background-color:{color};"></span>{row['Hito/Actividad']}</div>
-                <small>Responsable: {row['Responsable']}</small>
-            </div>
-            """, unsafe_allow_html=True)
-
-    with k_col2:
-        st.subheader(f"ESTA SEMANA ({len(tareas_semana)})")
-        if st.button("Ver Tareas de la Semana", key="btn_semana", use_container_width=True):
-            st.session_state.kanban_view = 'Semana'
-        for _, row in tareas_semana.iterrows():
-            color = get_priority_color(row['Prioridad'])
-            st.markdown(f"""
-            <div class="kanban-card">
-                <div class="kanban-card-title"><span class="priority-dot" style="background-color:{color};"></span>{row['Hito/Actividad']}</div>
-                <small>Responsable: {row['Responsable']}</small>
-            </div>
-            """, unsafe_allow_html=True)
-
-    with k_col3:
-        st.subheader(f"ESTA QUINCENA ({len(tareas_quincena)})")
-        if st.button("Ver Tareas de la Quincena", key="btn_quincena", use_container_width=True):
-            st.session_state.kanban_view = 'Quincena'
-        for _, row in tareas_quincena.iterrows():
-            color = get_priority_color(row['Prioridad'])
-            st.markdown(f"""
-            <div class="kanban-card">
-                <div class="kanban-card-title"><span class="priority-dot" style="background-color:{color};"></span>{row['Hito/Actividad']}</div>
-                <small>Responsable: {row['Responsable']}</small>
-            </div>
-            """, unsafe_allow_html=True)
-
-    with k_col4:
-        st.subheader(f"ESTE MES ({len(tareas_mes)})")
-        if st.button("Ver Tareas del Mes", key="btn_mes", use_container_width=True):
-            st.session_state.kanban_view = 'Mes'
-        for _, row in tareas_mes.iterrows():
-            color = get_priority_color(row['Prioridad'])
-            st.markdown(f"""
-            <div class="kanban-card">
-                <div class="kanban-card-title"><span class="priority-dot" style="background-color:{color};"></span>{row['Hito/Actividad']}</div>
-                <small>Responsable: {row['Responsable']}</small>
-            </div>
-            """, unsafe_allow_html=True)
+    # Una sola pasada asigna cada tarea pendiente (no cumplida) a su horizonte;
+    # el Kanban y la vista detallada reutilizan el mismo resultado
+    posiciones_kanban = bucket_pending_tasks(df_filtrado, datetime.now())
+    tareas_por_periodo = {clave: df_filtrado.iloc[posiciones] for clave, posiciones in posiciones_kanban.items()}
+
+    for k_col, (clave, titulo, texto_boton) in zip(st.columns(len(KANBAN_COLUMNS)), KANBAN_COLUMNS):
+        tareas = tareas_por_periodo[clave]
+        with k_col:
+            st.subheader(f"{titulo} ({len(tareas)})")
+            if st.button(texto_boton, key=f"btn_{clave.lower()}", use_container_width=True):
+                st.session_state.kanban_view = clave
+
+            # Todas las tarjetas visibles de la columna se envían en un único bloque HTML
+            limite = st.session_state.kanban_limits.get(clave, KANBAN_PAGE_SIZE)
+            st.markdown(render_cards_html(tareas.iloc[:limite]), unsafe_allow_html=True)
+            if len(tareas) > limite:
+                st.caption(f"Mostrando {limite} de {len(tareas)} tareas")
+                if st.button("Mostrar más", key=f"btn_mas_{clave.lower()}", use_container_width=True):
+                    st.session_state.kanban_limits[clave] = limite + KANBAN_PAGE_SIZE
+                    st.rerun()
+
+    # Resumen por responsable: un solo correo por persona con sus tareas vencidas o del próximo mes
+    if st.button("📬 Enviar resumen de tareas pendientes por responsable", key="btn_resumen_responsables"):
+        df_resumen = df_filtrado if 'Email' in df_filtrado.columns else df_filtrado.assign(Email=DEFAULT_EMAIL)
+        resumenes = build_digests(df_resumen, datetime.now())
+        if resumenes:
+            get_outbox().enqueue(resumenes)
+            total_tareas = sum(len(resumen['tasks']) for resumen in resumenes)
+            st.toast(f"📨 {len(resumenes)} resúmenes en cola ({total_tareas} tareas).", icon="✅")
+        else:
+            st.info("No hay tareas vencidas ni próximas para notificar.")
 else:
     st.info("No hay tareas pendientes para mostrar en el Kanban.")
 
 st.divider()
 
 # --- VISTA DETALLADA DEL KANBAN ---
-if st.session_state.kanban_view:
+if st.session_state.kanban_view and not df_filtrado.empty:
     period_map = {
-        'Hoy': (tareas_hoy, "Hoy"),
-        'Semana': (tareas_semana, "Esta Semana"),
-        'Quincena': (tareas_quincena, "Esta Quincena"),
-        'Mes': (tareas_mes, "Este Mes")
+        'Hoy': (tareas_por_periodo['Hoy'], "Hoy"),
+        'Semana': (tareas_por_periodo['Semana'], "Esta Semana"),
+        'Quincena': (tareas_por_periodo['Quincena'], "Esta Quincena"),
+        'Mes': (tareas_por_periodo['Mes'], "Este Mes")
     }
     
     df_vista, period_name = period_map.get(st.session_state.kanban_view)
@@ -288,14 +342,52 @@ if st.session_state.kanban_view:
         # Asumiendo que 'Responsable' contiene el email o puedes mapearlo.
         # Para el MVP, crearemos un email de ejemplo si no existe.
         if 'Email' not in df_vista.columns:
-            df_vista['Email'] = 'jferia@mintic.gov.co'
-
-        estados_en_vista = df_vista['Estado'].unique()
-        for estado in estados_en_vista:
-            with st.expander(f"Estado: {estado} ({len(df_vista[df_vista['Estado'] == estado])} tareas)", expanded=True):
-                tareas_por_estado = df_vista[df_vista['Estado'] == estado]
-                
-                # --- INICIO DE LA MODIFICACIÓN ---
+            df_vista = df_vista.assign(Email=DEFAULT_EMAIL)
+
+        # Índice agrupado por estado: una sola pasada sobre las tareas del periodo
+        orden_vista, grupos_estado = group_positions(df_vista, 'Estado')
+        st.markdown(" · ".join(
+            f"**{estado if estado is not None else 'Sin estado'}:** {fin - inicio}" for estado, inicio, fin in grupos_estado
+        ))
+
+        # Estado de los envíos de este periodo: una sola consulta al registro persistente,
+        # compartido entre sesiones y recargas del plan gracias a la clave estable de cada tarea
+        claves_vista = pd.Series(task_keys(df_vista), index=df_vista.index)
+        estados_registro = get_ledger().lookup(claves_vista)
+        estado_envio = {idx: estados_registro[clave] for idx, clave in claves_vista.items() if clave in estados_registro}
+
+        # Envío masivo: se encolan todos los recordatorios del periodo aún no enviados ni en cola
+        # (los que el programador está reintentando también: al encolarlos pasan a 'pending' y el programador los suelta)
+        sin_recordatorio = [estado_envio.get(idx) in (None, FAILED, RETRYING) for idx in df_vista.index]
+        df_pendientes = df_vista[sin_recordatorio]
+        envio_cols = st.columns([3, 2])
+        if envio_cols[0].button(f"Enviar recordatorios a todos en esta vista ({len(df_pendientes)}) 📧",
+                                key="btn_email_todos", disabled=df_pendientes.empty):
+            ids = enqueue_reminders(df_pendientes, claves_vista[sin_recordatorio])
+            estado_envio.update(dict.fromkeys(df_pendientes.index, PENDING))
+            st.toast(f"📨 {len(ids)} recordatorios en cola de envío.", icon="✅")
+        en_cola = sum(estado == PENDING for estado in estado_envio.values())
+        # Pulsar el botón basta: el rerun vuelve a consultar el estado en la cola
+        envio_cols[1].button(f"🔄 Actualizar estado de envíos ({en_cola} en cola)", key="btn_refrescar_envios")
+
+        # Solo las tareas de la página visible crean widgets
+        pag_cols = st.columns([1, 1, 3])
+        tamano_pagina = pag_cols[0].selectbox("Tareas por página", DETAIL_PAGE_SIZES, key="detalle_tamano_pagina")
+        total_paginas = max(1, -(-len(orden_vista) // tamano_pagina))
+        clave_pagina = f"detalle_pagina_{st.session_state.kanban_view}"
+        st.session_state[clave_pagina] = min(st.session_state.get(clave_pagina, 1), total_paginas)
+        pagina = pag_cols[1].number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, key=clave_pagina)
+        inicio_pagina = (pagina - 1) * tamano_pagina
+        fin_pagina = min(inicio_pagina + tamano_pagina, len(orden_vista))
+        pag_cols[2].caption(f"Mostrando tareas {inicio_pagina + 1}–{fin_pagina} de {len(orden_vista)}")
+
+        for estado, inicio_grupo, fin_grupo in grupos_estado:
+            desde, hasta = max(inicio_grupo, inicio_pagina), min(fin_grupo, fin_pagina)
+            if desde >= hasta:
+                continue
+            with st.expander(f"Estado: {estado} ({fin_grupo - inicio_grupo} tareas)", expanded=True):
+                tareas_por_estado = df_vista.iloc[orden_vista[desde:hasta]]
+
                 for idx, row in tareas_por_estado.iterrows():
                     
                     # Usamos columnas para organizar la información y los botones
@@ -317,53 +409,47 @@ if st.session_state.kanban_view:
                     with col_action:
                         # La clave del botón debe ser única para cada tarea. Usamos el índice 'idx'.
                         if st.button("Enviar Recordatorio 📧", key=f"btn_email_{idx}"):
-                            # Lógica para enviar el correo
-                            success = send_task_reminder_email(
-                                receiver_email=row['Email'],
-                                task_name=row['Hito/Actividad'],
-                                responsible_name=row['Responsable'],
-                                due_date=row['Fecha de fin']
-                            )
-                            if success:
-                                # Si el correo se envió, actualizamos el estado y mostramos un mensaje
-                                st.session_state.reminders_sent[idx] = True
-                                st.toast("✅ ¡Recordatorio enviado con éxito!", icon="🎉")
-                                # Forzamos un 'rerun' para que el checkbox se actualice al instante
-                                st.rerun()
-                            else:
-                                st.error("Hubo un error al enviar el correo.")
-
-                        # Casilla que se marca en "verde" (marcada) si el recordatorio se envió
+                            # El correo se encola y se envía en segundo plano: el botón responde al instante
+                            enqueue_reminders(tareas_por_estado.loc[[idx]], claves_vista.loc[[idx]])
+                            estado_envio[idx] = PENDING
+                            st.toast("📨 Recordatorio en cola de envío.", icon="✅")
+
+                        # Casilla que se marca en "verde" (marcada) cuando el recordatorio se envió
                         # La clave 'disabled=True' evita que el usuario la cambie manualmente.
-                        reminder_sent = st.session_state.reminders_sent.get(idx, False)
-                        st.checkbox("Recordatorio Enviado", value=reminder_sent, key=f"cb_{idx}", disabled=True)
+                        reminder_sent = estado_envio.get(idx) == SENT
+                        # El estado forma parte de la clave para que la casilla se redibuje al cambiar.
+                        st.checkbox("Recordatorio Enviado", value=reminder_sent, key=f"cb_{idx}_{reminder_sent}", disabled=True)
+                        if estado_envio.get(idx) == FAILED:
+                            st.caption("❌ Falló el envío")
+                        elif estado_envio.get(idx) == RETRYING:
+                            st.caption("🔁 Reintento programado")
+                        elif estado_envio.get(idx) is not None and not reminder_sent:
+                            st.caption("⏳ En cola")
 
                     st.markdown("---")
-                # --- FIN DE LA MODIFICACIÓN ---
 
 
 # --- DIAGRAMA DE GANTT ---
 st.header("🗓️ Cronograma de Actividades (Gantt)")
 if not df_filtrado.empty:
-    fig = px.timeline(
-        df_filtrado,
-        x_start='Fecha de inicio',
-        x_end='Fecha de fin',
-        y='Hito/Actividad',
+    # Con muchas tareas el Gantt se resume por Etapa; el selector permite ver el detalle de una
+    df_gantt, grupo_gantt, detalle_gantt = df_filtrado, 'Etapa', None
+    if len(df_filtrado) > GANTT_DETAIL_LIMIT:
+        etapas_gantt = sorted(df_filtrado['Etapa'].dropna().unique())
+        detalle_gantt = st.selectbox("Nivel de detalle del Gantt", ["Resumen por Etapa"] + etapas_gantt, key="gantt_detalle")
+        if detalle_gantt != "Resumen por Etapa":
+            df_gantt, grupo_gantt = df_filtrado[df_filtrado['Etapa'] == detalle_gantt], None
+
+    # La figura se reutiliza mientras no cambien los datos, los filtros ni el nivel de detalle
+    fig = gantt_figure(
+        df_gantt, st.session_state.data_version, {**filtros, 'Gantt': detalle_gantt},
+        start='Fecha de inicio',
+        end='Fecha de fin',
+        label='Hito/Actividad',
         color='Estado',
+        group=grupo_gantt,
         title="Cronograma por Estado de Actividad",
-        hover_name='Hito/Actividad',
-        custom_data=['Responsable', 'Etapa', 'Prioridad']
-    )
-    fig.update_yaxes(autorange="reversed", title="Actividad")
-    fig.update_xaxes(title="Fecha")
-    fig.update_traces(
-        hovertemplate="<b>%{hover_name}</b><br><br>" +
-                      "<b>Responsable:</b> %{customdata[0]}<br>" +
-                      "<b>Etapa:</b> %{customdata[1]}<br>" +
-                      "<b>Prioridad:</b> %{customdata[2]}<br>" +
-                      "<b>Inicio:</b> %{x[0]|%d-%b-%Y}<br>" +
-                      "<b>Fin:</b> %{x[1]|%d-%b-%Y}<extra></extra>"
+        hover_data=['Responsable', 'Etapa', 'Prioridad'],
     )
     st.plotly_chart(fig, use_container_width=True)
 else:
@@ -0,0 +1,217 @@
+import hashlib
+import io
+import logging
+import os
+
+import openpyxl
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from caching import LRUCache
+from task_table import compact_tasks
+
+logger = logging.getLogger(__name__)
+
+# Columnas que ambos dashboards necesitan para funcionar
+REQUIRED_COLUMNS = ['Hito/Actividad', 'Fecha de inicio', 'Fecha de fin', 'Etapa', 'Responsable', 'Estado']
+DATE_COLUMNS = ['Fecha de inicio', 'Fecha de fin']
+# Columnas opcionales que la carga por streaming conserva si existen en el archivo
+OPTIONAL_COLUMNS = ['Prioridad', 'Email', 'Bloqueada por', 'Bloquea a', 'Notificación Enviada']
+
+# A partir de este tamaño los dashboards usan la carga por streaming
+STREAMING_THRESHOLD_BYTES = int(os.environ.get("DASHBOARD_STREAMING_THRESHOLD", 5 * 1024 * 1024))
+STREAMING_CHUNK_ROWS = 20000
+
+# Directorio de la caché en disco (un archivo Parquet por contenido de Excel)
+CACHE_DIR = os.environ.get("DASHBOARD_CACHE_DIR", os.path.join(".cache", "planes"))
+
+# Caché en memoria compartida por todas las sesiones del servidor
+_memory_cache = LRUCache(maxsize=8)
+
+
+def file_digest(data):
+    """
+    Calcula la huella SHA-256 del contenido de un archivo.
+
+    Args:
+        data (bytes): Contenido del archivo subido.
+
+    Returns:
+        str: Huella hexadecimal del contenido.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def clean_project_frame(df):
+    """Limpia espacios, convierte las fechas y descarta las filas sin fechas válidas."""
+    for col in REQUIRED_COLUMNS:
+        if col in df.columns and pd.api.types.is_string_dtype(df[col].dtype):
+            df[col] = df[col].str.strip()
+
+    for col in DATE_COLUMNS:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    return df.dropna(subset=DATE_COLUMNS)
+
+
+def _compact_chunk(df):
+    """Limpia un bloque de filas y lo convierte a tipos compactos (categorías y fechas)."""
+    return compact_tasks(clean_project_frame(df))
+
+
+def _union_categoricals(parts):
+    """
+    Une columnas categóricas aunque sus categorías tengan tipos distintos.
+
+    Un bloque en el que la columna está vacía (p. ej. filas finales en blanco)
+    tiene categorías de tipo `object`, mientras que el resto las tiene de tipo
+    texto; antes de unirlas se llevan todas a un mismo tipo.
+    """
+    tipos = {part.cat.categories.dtype for part in parts if len(part.cat.categories)}
+    tipo = tipos.pop() if len(tipos) == 1 else object
+    return union_categoricals([
+        part if part.cat.categories.dtype == tipo else part.cat.set_categories(part.cat.categories.astype(tipo))
+        for part in parts
+    ])
+
+
+def _concat_chunks(chunks, columns):
+    """Une los bloques conservando las columnas categóricas sin pasar por `object`."""
+    # Los bloques que se quedaron sin filas tras la limpieza no aportan nada y sus tipos no son fiables
+    chunks = [chunk for chunk in chunks if len(chunk)]
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+
+    index = chunks[0].index.append([chunk.index for chunk in chunks[1:]])
+    data = {}
+    for col in columns:
+        # Se extrae cada columna de los bloques para liberar memoria a medida que se une
+        parts = [chunk.pop(col) for chunk in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            data[col] = _union_categoricals(parts)
+        else:
+            data[col] = pd.concat(parts).array
+    return pd.DataFrame(data, index=index)
+
+
+def read_workbook_streaming(data, chunk_rows=STREAMING_CHUNK_ROWS, progress_callback=None):
+    """
+    Lee un plan de proyecto por bloques usando el modo de solo lectura de openpyxl.
+
+    Solo se conservan las columnas requeridas y opcionales conocidas, y cada bloque
+    se limpia y compacta antes de leer el siguiente, de modo que la memoria máxima
+    depende del tamaño del bloque y no del número de filas del archivo.
+
+    Args:
+        data (bytes): Contenido del archivo .xlsx.
+        chunk_rows (int): Número de filas por bloque.
+        progress_callback (callable, optional): Función `(filas_leidas, filas_totales)`
+            llamada tras cada bloque. `filas_totales` puede ser None si el archivo
+            no declara sus dimensiones.
+
+    Returns:
+        pd.DataFrame: El DataFrame limpio con tipos compactos.
+    """
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(value).strip() if value is not None else None for value in next(rows, ())]
+
+        columns = [col for col in REQUIRED_COLUMNS + OPTIONAL_COLUMNS if col in header]
+        missing = [col for col in DATE_COLUMNS if col not in columns]
+        if missing:
+            raise ValueError(f"Faltan columnas obligatorias en el archivo: {', '.join(missing)}")
+        positions = [header.index(col) for col in columns]
+
+        total_rows = sheet.max_row - 1 if sheet.max_row else None
+        chunks = []
+        buffer = []
+        rows_read = 0
+        for row in rows:
+            width = len(row)
+            buffer.append([row[i] if i < width else None for i in positions])
+            if len(buffer) >= chunk_rows:
+                chunk = pd.DataFrame(buffer, columns=columns, index=range(rows_read, rows_read + len(buffer)))
+                rows_read += len(buffer)
+                buffer = []
+                chunks.append(_compact_chunk(chunk))
+                if progress_callback:
+                    progress_callback(rows_read, total_rows)
+        if buffer:
+            chunk = pd.DataFrame(buffer, columns=columns, index=range(rows_read, rows_read + len(buffer)))
+            rows_read += len(buffer)
+            chunks.append(_compact_chunk(chunk))
+        if progress_callback:
+            progress_callback(rows_read, rows_read)
+    finally:
+        workbook.close()
+
+    return _concat_chunks(chunks, columns)
+
+
+def _parquet_path(cache_key):
+    return os.path.join(CACHE_DIR, f"{cache_key}.parquet")
+
+
+def _read_parquet(cache_key):
+    path = _parquet_path(cache_key)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:
+        # Sin pyarrow o con un archivo corrupto simplemente volvemos a procesar el Excel
+        logger.warning(f"No se pudo leer la caché Parquet {path}: {e}")
+        return None
+
+
+def _write_parquet(cache_key, df):
+    path = _parquet_path(cache_key)
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"No se pudo escribir la caché Parquet {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_project_file(data, digest=None, streaming=False, progress_callback=None):
+    """
+    Carga y limpia un plan de proyecto en Excel usando la caché por contenido.
+
+    El archivo solo se procesa con openpyxl cuando su contenido no está ni en la
+    caché en memoria ni en la caché Parquet en disco.
+
+    Args:
+        data (bytes): Contenido del archivo .xlsx (p. ej. `uploaded_file.getvalue()`).
+        digest (str, optional): Huella ya calculada con `file_digest(data)`.
+        streaming (bool): Si es True, lee el archivo por bloques con
+            `read_workbook_streaming` (recomendado para planes muy grandes).
+        progress_callback (callable, optional): Se pasa a `read_workbook_streaming`.
+
+    Returns:
+        pd.DataFrame: Una copia del DataFrame limpio.
+    """
+    if digest is None:
+        digest = file_digest(data)
+    # Cada modo produce columnas y tipos distintos, así que se cachean por separado
+    cache_key = f"{digest}-stream" if streaming else digest
+
+    df = _memory_cache.get(cache_key)
+    if df is None:
+        df = _read_parquet(cache_key)
+        if df is None:
+            logger.info(f"Procesando el archivo Excel {digest[:12]}...")
+            if streaming:
+                df = read_workbook_streaming(data, progress_callback=progress_callback)
+            else:
+                df = compact_tasks(clean_project_frame(pd.read_excel(io.BytesIO(data))))
+            _write_parquet(cache_key, df)
+        _memory_cache.set(cache_key, df)
+
+    # Devolvemos una copia para que las sesiones no modifiquen el DataFrame en caché
+    return df.copy()
@@ -0,0 +1,264 @@
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from email_sender import send_bulk_reminders
+from sqlite_db import chunked, connect
+
+logger = logging.getLogger(__name__)
+
+# Base de datos SQLite donde se persiste la cola de correos
+OUTBOX_DB_PATH = os.environ.get("EMAIL_OUTBOX_DB", "email_outbox.db")
+
+# Estados posibles de un correo en la cola
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_status_next ON outbox (status, next_attempt_at);
+"""
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode(reminder):
+    """Serializa un recordatorio (fechas incluidas) a JSON."""
+    return json.dumps(reminder, ensure_ascii=False, default=_json_default)
+
+
+def _parse_due_date(item):
+    if isinstance(item.get("due_date"), str):
+        item["due_date"] = datetime.datetime.fromisoformat(item["due_date"])
+
+
+def _decode(payload):
+    data = json.loads(payload)
+    _parse_due_date(data)
+    # Los resúmenes por responsable llevan sus tareas anidadas
+    for task in data.get("tasks", []):
+        _parse_due_date(task)
+    return data
+
+
+class EmailOutbox:
+    """
+    Cola persistente de recordatorios que se envían en segundo plano.
+
+    Los correos se guardan en SQLite y un hilo despachador los reparte en lotes
+    a un pool de hilos que los envía con `send_bulk_reminders`. Los envíos
+    fallidos se reintentan con espera exponencial. Como la cola vive en disco,
+    los correos pendientes sobreviven a un reinicio de la aplicación.
+
+    Cada lote reclamado queda en 'sending' con una concesión de
+    `lease_seconds`: otra instancia sobre la misma base (otro proceso o una
+    caché de Streamlit reconstruida) no lo toca mientras la concesión siga
+    vigente, y solo si vence (p. ej. porque el proceso que lo enviaba murió)
+    vuelve a reclamarse.
+
+    Args:
+        db_path (str): Ruta de la base de datos SQLite.
+        workers (int): Número de hilos que envían correos en paralelo.
+        batch_size (int): Correos por lote (cada lote usa una sola conexión SMTP).
+        max_attempts (int): Intentos antes de marcar un correo como fallido.
+        backoff_base (float): Segundos de espera tras el primer fallo; se duplica en cada intento.
+        poll_interval (float): Segundos máximos que el despachador duerme sin novedades.
+        lease_seconds (float): Segundos que un lote en envío queda reservado para quien lo reclamó.
+        sender (callable): Función de envío con la interfaz de `send_bulk_reminders`.
+        on_status (callable, optional): Se llama tras cada lote con los recordatorios
+            y su nuevo estado ('sent', 'pending' si se reintentará o 'failed').
+    """
+
+    def __init__(self, db_path=OUTBOX_DB_PATH, workers=2, batch_size=50, max_attempts=5,
+                 backoff_base=30.0, poll_interval=5.0, sender=send_bulk_reminders, on_status=None,
+                 lease_seconds=900.0):
+        self.db_path = db_path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.sender = sender
+        self.on_status = on_status
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._slots = threading.Semaphore(workers)
+        self._executor = None
+        self._dispatcher = None
+
+        with connect(self.db_path) as conn:
+            conn.executescript(_SCHEMA)
+
+    def enqueue(self, reminders):
+        """
+        Encola recordatorios para enviarlos en segundo plano.
+
+        Args:
+            reminders (iterable[dict]): Recordatorios con el formato de `send_bulk_reminders`.
+
+        Returns:
+            list[int]: El identificador en la cola de cada recordatorio.
+        """
+        now = time.time()
+        ids = []
+        with connect(self.db_path) as conn:
+            for reminder in reminders:
+                cursor = conn.execute(
+                    "INSERT INTO outbox (payload, status, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                    (_encode(reminder), PENDING, now, now),
+                )
+                ids.append(cursor.lastrowid)
+        self._wakeup.set()
+        return ids
+
+    def statuses(self, ids):
+        """
+        Consulta el estado de varios correos en una sola consulta.
+
+        Args:
+            ids (iterable[int]): Identificadores devueltos por `enqueue`.
+
+        Returns:
+            dict[int, str]: Estado ('pending', 'sending', 'sent' o 'failed') por identificador.
+        """
+        ids = list(ids)
+        result = {}
+        with connect(self.db_path) as conn:
+            for chunk, placeholders in chunked(ids):
+                rows = conn.execute(f"SELECT id, status FROM outbox WHERE id IN ({placeholders})", chunk)
+                result.update(rows)
+        return result
+
+    def counts(self):
+        """Devuelve el número de correos en cada estado."""
+        with connect(self.db_path) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"))
+
+    def start(self):
+        """Arranca el hilo despachador y el pool de envío (si no estaban ya en marcha)."""
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        self._stopping.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="outbox")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="outbox-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def stop(self, wait=True):
+        """Detiene el despachador; con `wait=True` espera a que terminen los lotes en curso."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def _claim_batch(self):
+        """
+        Marca como 'sending' el siguiente lote de correos listos y lo devuelve.
+
+        En los correos en envío, `next_attempt_at` es el fin de la concesión: los
+        que la tienen vencida (su envío se interrumpió) se reclaman como los pendientes.
+        """
+        now = time.time()
+        with connect(self.db_path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, payload, attempts FROM outbox WHERE status IN (?, ?) AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at, id LIMIT ?",
+                (PENDING, SENDING, now, self.batch_size),
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE outbox SET status = ?, next_attempt_at = ? WHERE id = ?",
+                    [(SENDING, now + self.lease_seconds, row[0]) for row in rows],
+                )
+            return rows
+
+    def _seconds_until_next(self):
+        try:
+            with connect(self.db_path) as conn:
+                row = conn.execute(
+                    "SELECT MIN(next_attempt_at) FROM outbox WHERE status IN (?, ?)", (PENDING, SENDING)).fetchone()
+        except Exception as e:
+            logger.error(f"Error al leer la cola de correos: {e}")
+            return self.poll_interval
+        if row[0] is None:
+            return self.poll_interval
+        return min(max(row[0] - time.time(), 0), self.poll_interval)
+
+    def _dispatch_loop(self):
+        while not self._stopping.is_set():
+            # Solo se reclama un lote cuando hay un hilo libre para enviarlo
+            self._slots.acquire()
+            self._wakeup.clear()
+            try:
+                batch = self._claim_batch()
+            except Exception as e:
+                logger.error(f"Error al leer la cola de correos: {e}")
+                batch = []
+            if batch:
+                self._executor.submit(self._send_batch, batch)
+                continue
+            self._slots.release()
+            self._wakeup.wait(self._seconds_until_next())
+
+    def _send_batch(self, batch):
+        try:
+            reminders = [_decode(payload) for _, payload, _ in batch]
+            try:
+                results = list(self.sender(reminders))
+                error = "El envío no devolvió resultado"
+            except Exception as e:
+                logger.error(f"Error inesperado al enviar un lote de correos: {e}")
+                results = []
+                error = f"Resultado desconocido: {e}"
+            # No se sabe si los correos sin resultado llegaron a enviarse (algunos pueden
+            # haberse entregado antes del error): se marcan como fallidos sin reintento
+            # automático para no duplicarlos
+            results += [{"success": False, "error": error, "retryable": False}] * (len(batch) - len(results))
+
+            now = time.time()
+            updates = []
+            for (outbox_id, _, attempts), result in zip(batch, results):
+                attempts += 1
+                if result["success"]:
+                    updates.append((SENT, attempts, None, now, now, outbox_id))
+                elif result.get("retryable", True) and attempts < self.max_attempts:
+                    next_attempt = now + self.backoff_base * 2 ** (attempts - 1)
+                    updates.append((PENDING, attempts, result["error"], next_attempt, None, outbox_id))
+                else:
+                    updates.append((FAILED, attempts, result["error"], now, None, outbox_id))
+            with connect(self.db_path) as conn:
+                conn.executemany(
+                    "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ?, sent_at = ? "
+                    "WHERE id = ?",
+                    updates,
+                )
+            if self.on_status is not None:
+                try:
+                    self.on_status(reminders, [update[0] for update in updates])
+                except Exception as e:
+                    logger.error(f"Error al notificar el estado de un lote de correos: {e}")
+        finally:
+            self._slots.release()
+            self._wakeup.set()
@@ -1,8 +1,10 @@
 import os
+import base64
+import functools
 import logging
+import re
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.header import Header
 from dotenv import load_dotenv
 import datetime
 
@@ -13,77 +15,103 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def send_task_reminder_email(receiver_email, task_name, responsible_name, due_date):
-    """
-    Envía un correo de recordatorio para una tarea específica.
+# Estilos comunes de los correos en HTML
+_EMAIL_STYLE = """
+            body { font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; background-color: #f4f4f4; margin: 0; padding: 0; }
+            .container { max-width: 600px; margin: 20px auto; background-color: #ffffff; border-radius: 8px; box-shadow: 0 4px 8px rgba(0,0,0,0.1); overflow: hidden; }
+            .header { background-color: #004AAD; color: #ffffff; padding: 20px; text-align: center; }
+            .header h2 { margin: 0; }
+            .content { padding: 30px; line-height: 1.6; color: #333333; }
+            .task-details { background-color: #f9f9f9; border-left: 4px solid #004AAD; padding: 15px; margin: 20px 0; }
+            .task-details p { margin: 5px 0; }
+            .footer { background-color: #f4f4f4; color: #777777; padding: 20px; text-align: center; font-size: 12px; }
+            .action-request { margin-top: 25px; padding: 15px; background-color: #FFFBEB; border: 1px solid #FFD600; border-radius: 5px; }
+""".strip("\n")
 
-    Args:
-        receiver_email (str): El correo del responsable de la tarea.
-        task_name (str): El nombre de la tarea.
-        responsible_name (str): El nombre del responsable.
-        due_date (datetime): La fecha de vencimiento de la tarea.
+def _smtp_settings():
+    """
+    Lee la configuración SMTP de las variables de entorno.
 
     Returns:
-        bool: True si el correo se envió con éxito, False en caso contrario.
+        dict | None: La configuración, o None si está incompleta.
     """
-    # Credenciales de correo desde variables de entorno
-    sender_email = os.environ.get("EMAIL_SENDER")
-    smtp_server = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
-    smtp_port = int(os.environ.get("SMTP_PORT", 465))
-    smtp_username = os.environ.get("SMTP_USERNAME")
-    smtp_password = os.environ.get("SMTP_PASSWORD")
+    settings = {
+        "sender_email": os.environ.get("EMAIL_SENDER"),
+        "smtp_server": os.environ.get("SMTP_SERVER", "smtp.gmail.com"),
+        "smtp_port": int(os.environ.get("SMTP_PORT", 465)),
+        "smtp_username": os.environ.get("SMTP_USERNAME"),
+        "smtp_password": os.environ.get("SMTP_PASSWORD"),
+        # SMTP_USE_SSL=false permite usar un servidor local sin cifrado (p. ej. aiosmtpd en pruebas)
+        "use_ssl": os.environ.get("SMTP_USE_SSL", "true").lower() not in ("0", "false", "no"),
+        # Segundos de espera por cada operación de red: un servidor colgado no bloquea el envío para siempre
+        "timeout": float(os.environ.get("SMTP_TIMEOUT", 30)),
+    }
 
-    # Verificación de configuración básica
-    if not all([sender_email, smtp_username, smtp_password]):
+    # Verificación de configuración básica (sin SSL las credenciales son opcionales)
+    required = [settings["sender_email"]]
+    if settings["use_ssl"]:
+        required += [settings["smtp_username"], settings["smtp_password"]]
+    if not all(required):
         logger.error("La configuración de correo está incompleta. Revisa las variables de entorno.")
-        return False
+        return None
+    return settings
 
-    if not receiver_email or '@' not in receiver_email:
-        logger.error(f"Correo del destinatario inválido: {receiver_email}")
-        return False
 
-    # Crear el mensaje
-    message = MIMEMultipart()
-    message["Subject"] = f"Recordatorio: Tarea Pendiente - {task_name}"
-    message["From"] = f"Gestor de Proyectos <{sender_email}>"
-    message["To"] = receiver_email
-    year = datetime.datetime.now().year
+def _connect(settings):
+    """Abre una conexión SMTP autenticada."""
+    if settings["use_ssl"]:
+        server = smtplib.SMTP_SSL(settings["smtp_server"], settings["smtp_port"], timeout=settings["timeout"])
+    else:
+        server = smtplib.SMTP(settings["smtp_server"], settings["smtp_port"], timeout=settings["timeout"])
+    try:
+        if settings["smtp_username"]:
+            server.login(settings["smtp_username"], settings["smtp_password"])
+    except Exception:
+        _close(server)
+        raise
+    return server
 
-    # --- CUERPO DEL CORREO EN HTML ---
-    # Este es el template que solicita la confirmación y el archivo de comprobación.
-    email_body_html = f"""
+
+def _close(server):
+    """Cierra una conexión SMTP ignorando los errores de una conexión ya caída."""
+    if server is None:
+        return
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+# Plantilla HTML común de los correos. Las partes estáticas (estilos, textos y año)
+# se renderizan una sola vez con `_compiled_template`; por mensaje solo se insertan
+# los campos variables.
+_EMAIL_HTML = """
     <html>
     <head>
         <meta charset="UTF-8">
         <style>
-            body {{ font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; background-color: #f4f4f4; margin: 0; padding: 0; }}
-            .container {{ max-width: 600px; margin: 20px auto; background-color: #ffffff; border-radius: 8px; box-shadow: 0 4px 8px rgba(0,0,0,0.1); overflow: hidden; }}
-            .header {{ background-color: #004AAD; color: #ffffff; padding: 20px; text-align: center; }}
-            .header h2 {{ margin: 0; }}
-            .content {{ padding: 30px; line-height: 1.6; color: #333333; }}
-            .task-details {{ background-color: #f9f9f9; border-left: 4px solid #004AAD; padding: 15px; margin: 20px 0; }}
-            .task-details p {{ margin: 5px 0; }}
-            .footer {{ background-color: #f4f4f4; color: #777777; padding: 20px; text-align: center; font-size: 12px; }}
-            .action-request {{ margin-top: 25px; padding: 15px; background-color: #FFFBEB; border: 1px solid #FFD600; border-radius: 5px; }}
+{style}
         </style>
     </head>
     <body>
         <div class="container">
             <div class="header">
-                <h2>Recordatorio de Tarea Pendiente</h2>
+                <h2>{title}</h2>
             </div>
             <div class="content">
                 <p>Hola {responsible_name},</p>
-                <p>Este es un recordatorio amistoso sobre la siguiente tarea que tienes asignada:</p>
+                <p>{intro}</p>
                 
                 <div class="task-details">
-                    <p><strong>Tarea:</strong> {task_name}</p>
-                    <p><strong>Fecha de Vencimiento:</strong> {due_date.strftime('%d de %B de %Y')}</p>
+                    {task_details}
                 </div>
 
                 <div class="action-request">
                     <p><strong>Acción Requerida:</strong></p>
-                    <p>Por favor, al finalizar la tarea, responde a este correo para <strong>confirmar que ha sido completada</strong> y adjunta cualquier <strong>archivo de comprobación</strong> relevante (captura de pantalla, documento, etc.).</p>
+                    <p>Por favor, al finalizar {action_target}, responde a este correo para <strong>confirmar que ha sido completada</strong> y adjunta cualquier <strong>archivo de comprobación</strong> relevante (captura de pantalla, documento, etc.).</p>
                 </div>
                 
                 <p>Gracias por tu colaboración para mantener el proyecto en marcha.</p>
@@ -97,17 +125,282 @@ def send_task_reminder_email(receiver_email, task_name, responsible_name, due_da
     </body>
     </html>
     """
-    
-    message.attach(MIMEText(email_body_html, "html"))
 
-    # Enviar el correo
+# Textos fijos de cada tipo de correo
+_TEMPLATE_TEXTS = {
+    "task": {"title": "Recordatorio de Tarea Pendiente", "action_target": "la tarea"},
+    "digest": {"title": "Resumen de Tareas Pendientes", "action_target": "cada tarea"},
+}
+
+_REMINDER_INTRO = "Este es un recordatorio amistoso sobre la siguiente tarea que tienes asignada:"
+_OVERDUE_TAG = ' <strong style="color:#D00000;">(VENCIDA)</strong>'
+_SLOT = "\x00"
+# Saltos de línea (y el espacio que los sigue) dentro de un valor de encabezado
+_LINE_BREAKS = re.compile(r"[\r\n]+\s*")
+
+
+@functools.lru_cache(maxsize=8)
+def _compiled_template(kind, year):
+    """
+    Renderiza las partes estáticas de la plantilla de un tipo de correo.
+
+    Returns:
+        tuple[str, str, str, str]: Los fragmentos fijos que rodean al nombre del
+        responsable, la introducción y el detalle de las tareas.
+    """
+    html = _EMAIL_HTML.format(
+        style=_EMAIL_STYLE, year=year,
+        responsible_name=_SLOT, intro=_SLOT, task_details=_SLOT,
+        **_TEMPLATE_TEXTS[kind],
+    )
+    return tuple(html.split(_SLOT))
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_due_date(due_date):
+    return due_date.strftime('%d de %B de %Y')
+
+
+@functools.lru_cache(maxsize=64)
+def _from_header(sender_email):
+    return f"Gestor de Proyectos <{_single_line(sender_email)}>"
+
+
+def _single_line(value):
+    """
+    Une en una sola línea un valor de encabezado.
+
+    Un salto de línea en una celda del Excel (Alt+Enter) dentro del asunto o del
+    destinatario terminaría el encabezado antes de tiempo y permitiría inyectar
+    otros encabezados o mover los siguientes al cuerpo del mensaje.
+    """
+    return _LINE_BREAKS.sub(" ", str(value)).strip()
+
+
+def _encode_header(value):
+    """Codifica un encabezado en una sola línea y, si no es ASCII, según RFC 2047."""
+    value = _single_line(value)
+    return value if value.isascii() else Header(value, "utf-8").encode()
+
+
+def _render(kind, responsible_name, intro, task_details):
+    head, after_name, after_intro, tail = _compiled_template(kind, datetime.date.today().year)
+    return "".join((head, str(responsible_name), after_name, intro, after_intro, task_details, tail))
+
+
+def _build_raw_message(sender_email, receiver_email, subject, html):
+    """
+    Arma el mensaje MIME directamente como texto (text/html en UTF-8 con base64).
+
+    Equivale a lo que produce `MIMEText(html, "html").as_string()`, pero sin pasar
+    por el modelo de objetos ni el generador del paquete `email`.
+    """
+    return "".join((
+        'Content-Type: text/html; charset="utf-8"\n',
+        'MIME-Version: 1.0\n',
+        'Content-Transfer-Encoding: base64\n',
+        'Subject: ', _encode_header(subject), '\n',
+        'From: ', _from_header(sender_email), '\n',
+        'To: ', _single_line(receiver_email), '\n',
+        '\n',
+        base64.encodebytes(html.encode("utf-8")).decode("ascii"),
+    ))
+
+
+def render_reminder_html(task_name, responsible_name, due_date):
+    """
+    Renderiza el cuerpo HTML del recordatorio de una tarea.
+
+    Args:
+        task_name (str): El nombre de la tarea.
+        responsible_name (str): El nombre del responsable.
+        due_date (datetime): La fecha de vencimiento de la tarea.
+
+    Returns:
+        str: El HTML del correo.
+    """
+    # Este es el template que solicita la confirmación y el archivo de comprobación.
+    task_details = (
+        f"<p><strong>Tarea:</strong> {task_name}</p>\n"
+        f"                    <p><strong>Fecha de Vencimiento:</strong> {_format_due_date(due_date)}</p>"
+    )
+    return _render("task", responsible_name, _REMINDER_INTRO, task_details)
+
+
+def build_reminder_message(sender_email, receiver_email, task_name, responsible_name, due_date):
+    """
+    Construye el mensaje del recordatorio de una tarea.
+
+    Args:
+        sender_email (str): El correo del remitente.
+        receiver_email (str): El correo del responsable de la tarea.
+        task_name (str): El nombre de la tarea.
+        responsible_name (str): El nombre del responsable.
+        due_date (datetime): La fecha de vencimiento de la tarea.
+
+    Returns:
+        str: El mensaje MIME completo, listo para `smtplib.SMTP.sendmail`.
+    """
+    html = render_reminder_html(task_name, responsible_name, due_date)
+    return _build_raw_message(sender_email, receiver_email, f"Recordatorio: Tarea Pendiente - {task_name}", html)
+
+
+def build_digest_message(sender_email, receiver_email, responsible_name, tasks):
+    """
+    Construye un único correo que resume todas las tareas pendientes de un responsable.
+
+    Args:
+        sender_email (str): El correo del remitente.
+        receiver_email (str): El correo del responsable.
+        responsible_name (str): El nombre del responsable.
+        tasks (list[dict]): Tareas con las claves 'task_name', 'due_date' y 'overdue'.
+
+    Returns:
+        str: El mensaje MIME completo, listo para `smtplib.SMTP.sendmail`.
+    """
+    task_details = "".join(
+        f"<p><strong>Tarea:</strong> {task['task_name']}<br>"
+        f"<strong>Fecha de Vencimiento:</strong> {_format_due_date(task['due_date'])}"
+        f"{_OVERDUE_TAG if task.get('overdue') else ''}</p>"
+        for task in tasks
+    )
+    intro = f"Este es un recordatorio amistoso sobre las {len(tasks)} tareas pendientes que tienes asignadas:"
+    html = _render("digest", responsible_name, intro, task_details)
+    return _build_raw_message(sender_email, receiver_email, f"Recordatorio: {len(tasks)} Tarea(s) Pendiente(s)", html)
+
+
+def send_bulk_reminders(reminders, max_retries=1):
+    """
+    Envía varios recordatorios reutilizando una única conexión SMTP autenticada.
+
+    Si la conexión se cae durante el envío se vuelve a abrir automáticamente y
+    se reintenta el mensaje en curso hasta `max_retries` veces.
+
+    Args:
+        reminders (iterable[dict]): Recordatorios con las claves 'receiver_email',
+            'task_name', 'responsible_name' y 'due_date' (los mismos argumentos
+            que `send_task_reminder_email`). Los resúmenes por responsable llevan
+            `kind='digest'` y las claves 'receiver_email', 'responsible_name' y
+            'tasks' (ver `build_digest_message`).
+        max_retries (int): Reintentos por mensaje tras un error de conexión.
+
+    Returns:
+        list[dict]: Un resultado por recordatorio, en el mismo orden, con las
+        claves 'receiver_email', 'task_name', 'success', 'error' y 'retryable'
+        (si tiene sentido volver a intentar un envío fallido).
+    """
+    reminders = list(reminders)
+    settings = _smtp_settings()
+    if settings is None:
+        return [_result(r, False, "Configuración de correo incompleta", retryable=True) for r in reminders]
+
+    results = []
+    server = None
+    auth_error = None
     try:
-        logger.info(f"Intentando enviar recordatorio a {receiver_email} para la tarea '{task_name}'...")
-        with smtplib.SMTP_SSL(smtp_server, smtp_port) as server:
-            server.login(smtp_username, smtp_password)
-            server.sendmail(sender_email, receiver_email, message.as_string())
-        logger.info(f"Recordatorio enviado con éxito a {receiver_email}.")
-        return True
-    except Exception as e:
-        logger.error(f"Error al enviar el correo: {e}")
-        return False
\ No newline at end of file
+        for reminder in reminders:
+            receiver_email = reminder.get("receiver_email")
+            if auth_error is not None:
+                results.append(_result(reminder, False, auth_error, retryable=True))
+                continue
+            # Una celda vacía del Excel llega como NaN (float), no como texto; un salto de
+            # línea inyectaría comandos en la conversación SMTP
+            if not isinstance(receiver_email, str) or '@' not in receiver_email or _LINE_BREAKS.search(receiver_email):
+                logger.error(f"Correo del destinatario inválido: {receiver_email}")
+                results.append(_result(reminder, False, "Correo del destinatario inválido", retryable=False))
+                continue
+
+            # Un recordatorio con datos incompletos no debe interrumpir el envío del resto
+            try:
+                if reminder.get("kind") == "digest":
+                    message = build_digest_message(
+                        settings["sender_email"], receiver_email, reminder["responsible_name"], reminder["tasks"],
+                    )
+                else:
+                    message = build_reminder_message(
+                        settings["sender_email"], receiver_email,
+                        reminder["task_name"], reminder["responsible_name"], reminder["due_date"],
+                    )
+                descripcion = _describe(reminder)
+            except Exception as e:
+                logger.error(f"No se pudo construir el correo para {receiver_email}: {e}")
+                results.append(_result(reminder, False, f"No se pudo construir el correo: {e}", retryable=False))
+                continue
+
+            for attempt in range(max_retries + 1):
+                try:
+                    if server is None:
+                        server = _connect(settings)
+                    logger.info(f"Intentando enviar recordatorio a {receiver_email} para {descripcion}...")
+                    server.sendmail(settings["sender_email"], receiver_email, message)
+                    logger.info(f"Recordatorio enviado con éxito a {receiver_email}.")
+                    results.append(_result(reminder, True))
+                    break
+                except smtplib.SMTPAuthenticationError as e:
+                    # Con credenciales inválidas no tiene sentido intentar el resto
+                    logger.error(f"Error de autenticación SMTP: {e}")
+                    auth_error = f"Error de autenticación SMTP: {e}"
+                    results.append(_result(reminder, False, auth_error, retryable=True))
+                    break
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                    # El servidor rechazó este mensaje, pero la conexión sigue siendo válida
+                    logger.error(f"Error al enviar el correo a {receiver_email}: {e}")
+                    results.append(_result(reminder, False, str(e), retryable=False))
+                    break
+                except (smtplib.SMTPException, OSError) as e:
+                    logger.warning(f"Conexión SMTP perdida ({e}); reconectando...")
+                    _close(server)
+                    server = None
+                    if attempt == max_retries:
+                        logger.error(f"Error al enviar el correo a {receiver_email}: {e}")
+                        results.append(_result(reminder, False, str(e), retryable=True))
+                except Exception as e:
+                    # Error inesperado: no se sabe si el mensaje llegó, así que no se reintenta
+                    logger.error(f"Error inesperado al enviar el correo a {receiver_email}: {e}")
+                    _close(server)
+                    server = None
+                    results.append(_result(reminder, False, str(e), retryable=False))
+                    break
+    finally:
+        _close(server)
+
+    return results
+
+
+def _describe(reminder):
+    """Describe un recordatorio para los logs y los resultados."""
+    if reminder.get("kind") == "digest":
+        return f"un resumen de {len(reminder['tasks'])} tareas"
+    return f"la tarea '{reminder['task_name']}'"
+
+
+def _result(reminder, success, error=None, retryable=False):
+    return {
+        "receiver_email": reminder.get("receiver_email"),
+        "task_name": reminder.get("task_name"),
+        "success": success,
+        "error": error,
+        "retryable": retryable,
+    }
+
+
+def send_task_reminder_email(receiver_email, task_name, responsible_name, due_date):
+    """
+    Envía un correo de recordatorio para una tarea específica.
+
+    Args:
+        receiver_email (str): El correo del responsable de la tarea.
+        task_name (str): El nombre de la tarea.
+        responsible_name (str): El nombre del responsable.
+        due_date (datetime): La fecha de vencimiento de la tarea.
+
+    Returns:
+        bool: True si el correo se envió con éxito, False en caso contrario.
+    """
+    result = send_bulk_reminders([{
+        "receiver_email": receiver_email,
+        "task_name": task_name,
+        "responsible_name": responsible_name,
+        "due_date": due_date,
+    }], max_retries=0)
+    return result[0]["success"]
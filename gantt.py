@@ -0,0 +1,225 @@
+import copy
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from caching import LRUCache
+
+# A partir de este número de tareas el Gantt se resume por grupo
+GANTT_DETAIL_LIMIT = int(os.environ.get("DASHBOARD_GANTT_DETAIL_LIMIT", 300))
+
+_DATE_FORMAT = '%d-%b-%Y'
+
+# Figuras ya construidas, serializadas con `to_dict()`, por (versión de datos, filtros, opciones del Gantt)
+_figure_cache = LRUCache(maxsize=64)
+
+
+@functools.lru_cache(maxsize=65536)
+def wrap_text(text, length=50):
+    """Ajusta el texto a una longitud máxima por línea para el gráfico."""
+    if len(text) > length:
+        # Usamos <br> para que Plotly lo interprete como un salto de línea
+        words = text.split()
+        lines = []
+        current_line = ""
+        for word in words:
+            if len(current_line + " " + word) <= length:
+                current_line += " " + word
+            else:
+                lines.append(current_line.strip())
+                current_line = word
+        lines.append(current_line.strip())
+        return "<br>".join(lines)
+    return text
+
+
+def wrap_labels(labels, length=50):
+    """
+    Aplica `wrap_text` a una serie de etiquetas, una sola vez por valor distinto.
+
+    Args:
+        labels (pd.Series): Las etiquetas (p. ej. 'Hito/Actividad').
+        length (int): Longitud máxima de cada línea.
+
+    Returns:
+        pd.Series: Las etiquetas ajustadas, con el mismo índice.
+    """
+    codigos, valores = pd.factorize(labels)
+    ajustadas = np.array([wrap_text(str(valor), length) for valor in valores] + [""], dtype=object)
+    return pd.Series(ajustadas[codigos], index=labels.index)
+
+
+def _palette(values):
+    """Asigna un color de la paleta cualitativa a cada valor, en orden de aparición."""
+    colores = px.colors.qualitative.Plotly
+    return {valor: colores[i % len(colores)] for i, valor in enumerate(values)}
+
+
+def _bar_trace(inicio, fin, etiquetas, colores, customdata, hovertemplate):
+    """Una única traza de barras horizontales con un color por barra."""
+    duracion = (fin - inicio).to_numpy() / np.timedelta64(1, 'ms')
+    return go.Bar(
+        base=inicio, x=duracion, y=etiquetas, orientation='h',
+        marker_color=colores, customdata=customdata, hovertemplate=hovertemplate,
+        showlegend=False,
+    )
+
+
+def _legend_entries(paleta):
+    """Entradas de leyenda sin datos: la traza principal lleva todos los colores."""
+    return [
+        go.Scatter(x=[None], y=[None], mode='markers', name=str(valor),
+                   marker=dict(color=color, symbol='square', size=10))
+        for valor, color in paleta.items()
+    ]
+
+
+def gantt_summary(df, start, end, group, color):
+    """
+    Resume las tareas por grupo para el Gantt agregado.
+
+    Args:
+        df (pd.DataFrame): Las tareas a resumir.
+        start (str): Columna con la fecha de inicio.
+        end (str): Columna con la fecha de fin.
+        group (str): Columna por la que se agrupa (p. ej. 'Etapa').
+        color (str): Columna cuyo desglose se muestra en cada grupo (p. ej. 'Estado').
+
+    Returns:
+        pd.DataFrame: Una fila por grupo, ordenada por fecha de inicio, con las
+        columnas 'inicio', 'fin', 'tareas' y 'desglose' (texto HTML).
+    """
+    resumen = df.groupby(group, observed=True, sort=False).agg(
+        inicio=(start, 'min'), fin=(end, 'max'), tareas=(start, 'size'))
+    conteos = pd.crosstab(df[group], df[color])
+    desglose = pd.Series("", index=conteos.index)
+    for valor in conteos.columns:
+        con_valor = conteos[valor] > 0
+        desglose[con_valor] += f"{valor}: " + conteos.loc[con_valor, valor].astype(str) + "<br>"
+    resumen['desglose'] = desglose.reindex(resumen.index).fillna("")
+    return resumen.sort_values('inicio', kind='stable')
+
+
+def build_gantt_figure(df, start, end, label, color, group=None, title=None, hover_data=(),
+                       detail_limit=GANTT_DETAIL_LIMIT, wrap_width=None):
+    """
+    Construye el diagrama de Gantt con un nivel de detalle acotado.
+
+    Con hasta `detail_limit` tareas se dibuja una barra por tarea. Con más, si
+    se indica `group`, se dibuja una barra por grupo (de la primera fecha de
+    inicio a la última de fin) con el número de tareas y su desglose por
+    `color`; sin `group`, se muestran solo las primeras `detail_limit` tareas
+    por fecha de inicio. En ambos casos todas las barras van en una única
+    traza, de modo que el tamaño de la figura no crece con el plan.
+
+    Args:
+        df (pd.DataFrame): Las tareas a dibujar.
+        start (str): Columna con la fecha de inicio.
+        end (str): Columna con la fecha de fin.
+        label (str): Columna con el nombre de cada tarea (eje Y del detalle).
+        color (str): Columna que colorea las barras del detalle.
+        group (str, optional): Columna por la que se resume cuando hay demasiadas tareas.
+        title (str, optional): Título de la figura.
+        hover_data (sequence[str]): Columnas adicionales a mostrar al pasar el ratón.
+        detail_limit (int): Máximo de tareas que se dibujan una a una.
+        wrap_width (int, optional): Si se indica, las etiquetas del detalle se
+            ajustan a esta longitud de línea con `wrap_labels`.
+
+    Returns:
+        go.Figure: La figura del Gantt.
+    """
+    if len(df) > detail_limit and group is not None:
+        return _summary_figure(df, start, end, group, color, title)
+
+    total = len(df)
+    if total > detail_limit:
+        df = df.iloc[np.argsort(df[start].to_numpy(), kind='stable')[:detail_limit]]
+        title = f"{title or ''} (primeras {detail_limit} de {total} tareas)".strip()
+
+    etiquetas = df[label] if wrap_width is None else wrap_labels(df[label], wrap_width)
+    valores_color = df[color].astype(object)
+    paleta = _palette(pd.unique(valores_color))
+
+    columnas_hover = [label, *hover_data]
+    customdata = np.column_stack(
+        [df[columna].astype(object).to_numpy() for columna in columnas_hover]
+        + [df[start].dt.strftime(_DATE_FORMAT).to_numpy(), df[end].dt.strftime(_DATE_FORMAT).to_numpy()]
+    )
+    n = len(columnas_hover)
+    hovertemplate = (
+        "<b>%{customdata[0]}</b><br><br>"
+        + "".join(f"<b>{columna}:</b> %{{customdata[{i}]}}<br>" for i, columna in enumerate(hover_data, start=1))
+        + f"<b>Inicio:</b> %{{customdata[{n}]}}<br>"
+        + f"<b>Fin:</b> %{{customdata[{n + 1}]}}<extra></extra>"
+    )
+
+    fig = go.Figure([
+        _bar_trace(df[start], df[end], etiquetas, valores_color.map(paleta), customdata, hovertemplate),
+        *_legend_entries(paleta),
+    ])
+    fig.update_layout(title=title, legend_title_text=color)
+    fig.update_xaxes(type='date', title="Fecha")
+    fig.update_yaxes(autorange="reversed", title="Actividad")
+    return fig
+
+
+def _summary_figure(df, start, end, group, color, title):
+    resumen = gantt_summary(df, start, end, group, color)
+    etiquetas = resumen.index.astype(str)
+    paleta = _palette(etiquetas)
+    customdata = np.column_stack([
+        resumen['tareas'].to_numpy(),
+        resumen['inicio'].dt.strftime(_DATE_FORMAT).to_numpy(),
+        resumen['fin'].dt.strftime(_DATE_FORMAT).to_numpy(),
+        resumen['desglose'].to_numpy(),
+    ])
+    hovertemplate = (
+        "<b>%{y}</b><br><br>"
+        "<b>Tareas:</b> %{customdata[0]}<br>"
+        "<b>Inicio:</b> %{customdata[1]}<br>"
+        "<b>Fin:</b> %{customdata[2]}<br><br>"
+        "%{customdata[3]}<extra></extra>"
+    )
+    fig = go.Figure(_bar_trace(resumen['inicio'], resumen['fin'], etiquetas,
+                               [paleta[etiqueta] for etiqueta in etiquetas], customdata, hovertemplate))
+    fig.update_layout(title=f"{title or 'Cronograma'} (resumen por {group}: {len(df)} tareas)")
+    fig.update_xaxes(type='date', title="Fecha")
+    fig.update_yaxes(autorange="reversed", title=group)
+    return fig
+
+
+def gantt_figure(df, data_version, selections, **options):
+    """
+    Versión memoizada de `build_gantt_figure`.
+
+    Las reejecuciones que no cambian los datos, los filtros ni las opciones del
+    Gantt reutilizan la figura ya construida. La caché, compartida por todas
+    las sesiones, guarda la figura serializada y cada llamada devuelve una
+    figura nueva, así que los cambios que haga quien la recibe (p. ej.
+    `update_layout`) no afectan a otras sesiones.
+
+    Args:
+        df (pd.DataFrame): Las tareas a dibujar (ya filtradas).
+        data_version (str): Versión de los datos cargados (cambia al cargar o editar).
+        selections (dict): Filtros (y selección de detalle) aplicados para obtener `df`.
+        **options: Argumentos de `build_gantt_figure`.
+
+    Returns:
+        go.Figure: Una figura nueva, construida o reconstruida desde la caché.
+    """
+    key = (
+        data_version,
+        tuple(sorted(selections.items())),
+        tuple(sorted((nombre, tuple(valor) if isinstance(valor, list) else valor) for nombre, valor in options.items())),
+    )
+    serializada = _figure_cache.get(key)
+    if serializada is None:
+        fig = build_gantt_figure(df, **options)
+        _figure_cache.set(key, fig.to_dict())
+        return fig
+    # El diccionario sale de una figura ya validada: se reconstruye sin volver a validarla
+    return go.Figure(copy.deepcopy(serializada), _validate=False)
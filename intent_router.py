@@ -0,0 +1,193 @@
+"""
+Respuestas locales a las preguntas más comunes del chat.
+
+La mayoría de las preguntas son conteos y listados (tareas vencidas, tareas
+por responsable, tareas de una etapa, programas en rojo) que pandas resuelve
+en microsegundos. `route_question` reconoce esas preguntas y las responde con
+una consulta vectorizada sobre la tabla filtrada; para las preguntas abiertas,
+negadas, con disyunciones o superlativos, sobre una tarea concreta o que piden
+una métrica que no calcula devuelve None y el dashboard recurre al modelo
+generativo.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from assistant import TASKS_SCHEMA, normalize_text, pending_mask
+from caching import LRUCache
+
+# Máximo de tareas o valores que se listan en una respuesta
+MAX_LISTED = 20
+
+# Solo se responden localmente las preguntas que piden un conteo o un listado...
+_QUERY_START = re.compile(r"^(cuant[oa]s?|cuales?|que|quien(es)?|lista(r|me)?|muestra(me)?|dame|dime|ver)\b")
+# ...y que no piden una explicación o una valoración
+_OPEN_ENDED = re.compile(
+    r"\b(por que|porque|como|deberia|deberiamos|recomienda\w*|sugiere\w*|sugerencia\w*|explica\w*|analiza\w*|"
+    r"opina\w*|riesgo\w*|predic\w*|proyecc\w*|prioriza\w*|resume\w*|resumen)\b")
+# Negaciones: el router solo sabe filtrar por inclusión
+_NEGATION = re.compile(r"\b(no|sin|excepto|salvo|menos|ningun[oa]?|nadie)\b")
+# Disyunciones ("vencidas o a tiempo"): el router combina los filtros siempre con "y"
+_DISJUNCTION = re.compile(r"\b[ou]\b")
+# Superlativos ("¿qué etapa tiene más tareas...?"): piden un máximo, no un listado
+_SUPERLATIVE = re.compile(r"\b(mas|mayor(es)?|menor(es)?|maxim[oa]s?|minim[oa]s?|mejor(es)?|peor(es)?)\b")
+# Métricas que el router no calcula (solo cuenta y lista)
+_UNSUPPORTED_METRIC = re.compile(
+    r"\b(porcentaje\w*|porcentual|promedio\w*|media|mediana|fecha\w*|cuando|dias?|duracion\w*|"
+    r"avance\w*|progreso|plazo\w*)\b")
+# Raíces que piden las tareas sin completar con la fecha de fin ya pasada
+_OVERDUE_STEMS = ("vencid", "atrasad", "retrasad", "expirad")
+# "¿Quién...?" pregunta por el responsable
+_WHO = re.compile(r"^quien(es)?\b")
+
+# Nombres de tarea normalizados, por (versión de datos, filtros, esquema)
+_names_cache = LRUCache(maxsize=16)
+
+
+def _words(question):
+    """Pregunta normalizada: minúsculas, sin tildes ni signos y con espacios en los extremos."""
+    return " " + " ".join(re.sub(r"[^\w\s]", " ", normalize_text(question)).split()) + " "
+
+
+def _mentions(texto, palabra):
+    """Indica si la pregunta menciona la palabra o frase, también en plural."""
+    return any(f" {palabra}{sufijo} " in texto for sufijo in ("", "s", "es"))
+
+
+def _task_names(df, schema, cache_key=None):
+    """Conjunto de nombres de tarea normalizados como la pregunta."""
+    nombres = _names_cache.get(cache_key) if cache_key is not None else None
+    if nombres is None:
+        nombres = frozenset(_words(nombre).strip() for nombre in pd.unique(df[schema.name_column].dropna().astype(str)))
+        if cache_key is not None:
+            _names_cache.set(cache_key, nombres)
+    return nombres
+
+
+def _mentions_task(texto, nombres):
+    """Indica si algún tramo de la pregunta es el nombre de una tarea (se pregunta por ella, no por un grupo)."""
+    palabras = texto.split()
+    return any(
+        len(tramo) > 3 and tramo in nombres
+        for tramo in (" ".join(palabras[i:j]) for i in range(len(palabras)) for j in range(i + 1, len(palabras) + 1))
+    )
+
+
+def _mentioned_values(df, texto, columns):
+    """
+    Valores de las columnas de agrupación que aparecen en la pregunta.
+
+    Returns:
+        dict[str, list]: Valores mencionados por columna (solo las columnas con alguno).
+    """
+    mencionados = {}
+    for columna in columns:
+        serie = df[columna]
+        valores = serie.cat.categories if isinstance(serie.dtype, pd.CategoricalDtype) else pd.unique(serie.dropna())
+        encontrados = [v for v in valores if len(str(v)) > 2 and _mentions(texto, normalize_text(v).strip())]
+        if encontrados:
+            mencionados[columna] = encontrados
+    return mencionados
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d') if pd.notna(value) else "sin fecha"
+
+
+def _list_tasks(df, schema, columns):
+    lineas = []
+    for fila in df.head(MAX_LISTED).itertuples(index=False):
+        fila = dict(zip(df.columns, fila))
+        detalles = " · ".join(str(fila[c]) for c in columns)
+        lineas.append(f"- **{fila[schema.name_column]}** — fin {_format_date(fila[schema.due_column])}"
+                      + (f" · {detalles}" if detalles else ""))
+    if len(df) > MAX_LISTED:
+        lineas.append(f"- ... y {len(df) - MAX_LISTED} más")
+    return lineas
+
+
+def _list_counts(conteos):
+    lineas = [f"- {valor}: {n}" for valor, n in conteos.head(MAX_LISTED).items()]
+    if len(conteos) > MAX_LISTED:
+        lineas.append(f"- ... y {len(conteos) - MAX_LISTED} valores más")
+    return lineas
+
+
+def route_question(df, question, schema=TASKS_SCHEMA, data_version=None, selections=None, reference_date=None):
+    """
+    Responde localmente una pregunta de conteo o listado sobre la tabla.
+
+    Se reconocen tres tipos de pregunta, combinables entre sí:
+
+    - Filtros: valores de las columnas de agrupación mencionados en la pregunta
+      ("etapa Diseño", "en Rojo", "de Ana") y las tareas vencidas.
+    - Agrupación: "por responsable", "por etapa"... devuelve conteos por valor.
+    - Entidad: "¿qué programas...?", "¿quiénes...?" devuelve los valores
+      distintos de esa columna entre las filas filtradas.
+
+    Args:
+        df (pd.DataFrame): La tabla ya filtrada por el dashboard.
+        question (str): La pregunta del usuario.
+        schema (ContextSchema): Columnas a usar.
+        data_version (str, optional): Versión de los datos; con ella se guardan en caché
+            los nombres de tarea normalizados.
+        selections (dict, optional): Filtros aplicados para obtener `df`.
+        reference_date (datetime, optional): Fecha para decidir qué está vencido; por defecto, hoy.
+
+    Returns:
+        str | None: La respuesta en Markdown, o None si la pregunta no es de un
+        tipo conocido y debe responderla el modelo.
+    """
+    texto = _words(question)
+    if (not _QUERY_START.match(texto.strip()) or _OPEN_ENDED.search(texto) or _NEGATION.search(texto)
+            or _DISJUNCTION.search(texto) or _SUPERLATIVE.search(texto) or _UNSUPPORTED_METRIC.search(texto)):
+        return None
+    if schema.name_column in df.columns:
+        cache_key = (data_version, tuple(sorted((selections or {}).items())), schema) if data_version is not None else None
+        if _mentions_task(texto, _task_names(df, schema, cache_key)):
+            return None
+
+    columnas = [c for c in schema.group_columns if c in df.columns]
+    nombres = {columna: normalize_text(columna) for columna in columnas}
+    agrupar = next((c for c in columnas if _mentions(texto, f"por {nombres[c]}")), None)
+    if agrupar is None and _WHO.match(texto.strip()) and 'Responsable' in columnas:
+        entidad = 'Responsable'
+    else:
+        # Solo el plural ("programas") pide la lista de valores; el singular suele preceder a un valor
+        entidad = next((c for c in columnas if c != agrupar
+                        and any(f" {nombres[c]}{sufijo} " in texto for sufijo in ("s", "es"))), None)
+
+    mencionados = _mentioned_values(df, texto, columnas)
+    valores_normalizados = " ".join(normalize_text(v) for valores in mencionados.values() for v in valores)
+    vencidas = any(raiz in texto and raiz not in valores_normalizados for raiz in _OVERDUE_STEMS)
+    if not mencionados and not vencidas and agrupar is None and entidad is None:
+        return None
+
+    mascara = np.ones(len(df), dtype=bool)
+    condiciones = []
+    for columna, valores in mencionados.items():
+        mascara &= df[columna].isin(valores).to_numpy()
+        condiciones.append(f"{columna}: {', '.join(map(str, valores))}")
+    if vencidas:
+        hoy = pd.Timestamp.now().normalize() if reference_date is None else pd.Timestamp(reference_date)
+        mascara &= pending_mask(df, schema) & (df[schema.due_column] < hoy).to_numpy()
+        condiciones.append(f"vencidas al {_format_date(hoy)}")
+    seleccion = df[mascara]
+    descripcion = f" ({'; '.join(condiciones)})" if condiciones else ""
+
+    if agrupar is not None or entidad is not None:
+        columna = agrupar if agrupar is not None else entidad
+        conteos = seleccion[columna].value_counts()
+        conteos = conteos[conteos > 0]
+        if not len(conteos):
+            return f"No hay registros{descripcion}."
+        encabezado = (f"**{len(seleccion)}** registros por {columna}{descripcion}:" if agrupar is not None
+                      else f"**{len(conteos)}** valores de {columna} con registros{descripcion}:")
+        return "\n".join([encabezado, *_list_counts(conteos)])
+
+    if seleccion.empty:
+        return f"No hay registros{descripcion}."
+    seleccion = seleccion.sort_values(schema.due_column, kind='stable')
+    detalles = [c for c in columnas if c not in mencionados]
+    return "\n".join([f"Hay **{len(seleccion)}** registros{descripcion}:", *_list_tasks(seleccion, schema, detalles)])
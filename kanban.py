@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+# Colores del punto de prioridad de cada tarjeta
+PRIORITY_COLORS = {
+    'Alta': '#FF4B4B', # Rojo
+    'Media': '#FFD43B', # Amarillo
+}
+DEFAULT_PRIORITY_COLOR = '#3D9970' # Verde
+
+
+def kanban_horizons(hoy):
+    """
+    Horizontes por defecto del Kanban.
+
+    Cada horizonte es una tupla `(clave, último día)`, donde el último día se
+    cuenta en días naturales desde hoy (0 = hoy) y se incluye en el horizonte.
+    Cada tarea cae en el primer horizonte cuyo último día no haya pasado.
+
+    Args:
+        hoy (datetime): Fecha de referencia.
+
+    Returns:
+        list[tuple[str, int]]: Los horizontes ordenados de más cercano a más lejano.
+    """
+    return [
+        ('Hoy', 0),
+        ('Semana', 7 - hoy.weekday()), # Hasta el lunes siguiente
+        ('Quincena', 15),
+        ('Mes', 30),
+    ]
+
+
+def bucket_pending_tasks(df, hoy, horizons=None):
+    """
+    Asigna cada tarea pendiente a su horizonte del Kanban en una sola pasada.
+
+    Las fechas de fin se convierten a días desde hoy y se ubican en los límites
+    de los horizontes con `np.searchsorted`. Las tareas cumplidas, vencidas o
+    más allá del último horizonte no se asignan.
+
+    Args:
+        df (pd.DataFrame): La tabla de tareas (normalmente ya filtrada).
+        hoy (datetime): Fecha de referencia.
+        horizons (list[tuple[str, int]], optional): Horizontes con el formato de
+            `kanban_horizons`. Por defecto, `kanban_horizons(hoy)`.
+
+    Returns:
+        dict[str, np.ndarray]: Posiciones (para `df.iloc`) de las tareas de cada horizonte.
+    """
+    if horizons is None:
+        horizons = kanban_horizons(hoy)
+    limites = np.array([ultimo_dia for _, ultimo_dia in horizons])
+    if np.any(np.diff(limites) < 0):
+        raise ValueError("Los horizontes del Kanban deben estar ordenados de menor a mayor.")
+
+    fin = df['Fecha de fin'].to_numpy().astype('datetime64[D]')
+    dias = (fin - np.datetime64(hoy.date(), 'D')).astype(np.int64)
+    pendientes = (df['Estado'] != 'CUMPLIDA').to_numpy()
+
+    # Los valores fuera de todo horizonte van a un cubo extra que se descarta
+    cubo = np.searchsorted(limites, dias, side='left')
+    cubo[(dias < 0) | ~pendientes] = len(horizons)
+
+    orden = np.argsort(cubo, kind='stable')
+    conteo = np.bincount(cubo, minlength=len(horizons) + 1)
+    partes = np.split(orden, np.cumsum(conteo)[:-1])
+    return {clave: partes[i] for i, (clave, _) in enumerate(horizons)}
+
+
+def group_positions(df, column='Estado'):
+    """
+    Agrupa las filas por el valor de una columna en una sola pasada.
+
+    Los grupos conservan el orden de aparición de sus valores y las filas sin
+    valor se agrupan al final bajo None.
+
+    Args:
+        df (pd.DataFrame): Las tareas a agrupar.
+        column (str): Columna por la que se agrupa.
+
+    Returns:
+        tuple[np.ndarray, list[tuple]]: Las posiciones de las filas ordenadas por
+        grupo y, para cada grupo, una tupla `(valor, inicio, fin)` con su tramo
+        dentro de esas posiciones.
+    """
+    codigos, valores = pd.factorize(df[column])
+    codigos = np.where(codigos < 0, len(valores), codigos)
+    orden = np.argsort(codigos, kind='stable')
+    conteo = np.bincount(codigos, minlength=len(valores) + 1)
+    limites = np.concatenate([[0], np.cumsum(conteo)])
+    valores = list(valores) + [None]
+    grupos = [(valores[i], int(limites[i]), int(limites[i + 1])) for i in range(len(valores)) if conteo[i]]
+    return orden, grupos
+
+
+def _escape_html(series):
+    """Escapa los caracteres especiales de HTML de una serie de textos."""
+    return (series.astype(str)
+            .str.replace('&', '&amp;', regex=False)
+            .str.replace('<', '&lt;', regex=False)
+            .str.replace('>', '&gt;', regex=False))
+
+
+def render_cards_html(df):
+    """
+    Construye el HTML de todas las tarjetas de una columna del Kanban.
+
+    El HTML se arma con operaciones de texto vectorizadas sobre las columnas,
+    para poder emitir la columna completa en una sola llamada a `st.markdown`.
+
+    Args:
+        df (pd.DataFrame): Las tareas a mostrar, con 'Hito/Actividad',
+            'Responsable' y 'Prioridad'.
+
+    Returns:
+        str: El HTML de las tarjetas concatenadas.
+    """
+    if df.empty:
+        return ""
+    colores = df['Prioridad'].astype(object).map(PRIORITY_COLORS).fillna(DEFAULT_PRIORITY_COLOR)
+    tarjetas = (
+        '<div class="kanban-card"><div class="kanban-card-title">'
+        '<span class="priority-dot" style="background-color:' + colores + ';"></span>'
+        + _escape_html(df['Hito/Actividad']) + '</div>'
+        '<small>Responsable: ' + _escape_html(df['Responsable']) + '</small></div>'
+    )
+    return "".join(tarjetas.tolist())
@@ -0,0 +1,83 @@
+from typing import NamedTuple
+
+import pandas as pd
+
+from caching import LRUCache
+
+# Resultados memoizados por (versión de datos, filtros, fecha de referencia)
+_metrics_cache = LRUCache(maxsize=256)
+
+
+class KeyMetrics(NamedTuple):
+    """Indicadores clave que muestran los dashboards."""
+    total: int
+    por_comenzar: int
+    en_proceso: int
+    completadas: int
+    bloqueadas: int
+    vencidas: int
+
+    @property
+    def no_bloqueadas(self):
+        return self.total - self.bloqueadas
+
+    @property
+    def progreso(self):
+        """Porcentaje de actividades completadas."""
+        return (self.completadas / self.total) * 100 if self.total > 0 else 0
+
+
+def compute_key_metrics(df, reference_date):
+    """
+    Calcula todos los indicadores clave de una tabla de tareas.
+
+    Los conteos por estado salen de un único `value_counts` (un recuento de
+    códigos cuando 'Estado' es categórica); los vencimientos se resuelven con
+    una sola máscara vectorizada.
+
+    Args:
+        df (pd.DataFrame): La tabla de tareas (normalmente ya filtrada).
+        reference_date (datetime): Fecha a partir de la cual una tarea está vencida.
+
+    Returns:
+        KeyMetrics: Los indicadores calculados.
+    """
+    conteo_estados = df['Estado'].value_counts()
+    completadas = conteo_estados[conteo_estados.index.astype(str).str.contains("CUMPLIDA")].sum()
+
+    if 'Bloqueada por' in df.columns:
+        bloqueadas = df['Bloqueada por'].notna().sum()
+    else:
+        bloqueadas = 0
+
+    vencidas = ((df['Fecha de fin'] < reference_date) & (df['Estado'] != 'CUMPLIDA')).sum()
+
+    return KeyMetrics(
+        total=len(df),
+        por_comenzar=int(conteo_estados.get('POR COMENZAR', 0)),
+        en_proceso=int(conteo_estados.get('A TIEMPO', 0)),
+        completadas=int(completadas),
+        bloqueadas=int(bloqueadas),
+        vencidas=int(vencidas),
+    )
+
+
+def key_metrics(df, data_version, selections, reference_date):
+    """
+    Versión memoizada de `compute_key_metrics`.
+
+    Args:
+        df (pd.DataFrame): La tabla de tareas ya filtrada.
+        data_version (str): Versión de los datos cargados (cambia al cargar o editar).
+        selections (dict): Filtros aplicados para obtener `df`.
+        reference_date (datetime): Fecha de referencia para los vencimientos.
+
+    Returns:
+        KeyMetrics: Los indicadores calculados o recuperados de la caché.
+    """
+    key = (data_version, tuple(sorted(selections.items())), pd.Timestamp(reference_date))
+    metrics = _metrics_cache.get(key)
+    if metrics is None:
+        metrics = compute_key_metrics(df, reference_date)
+        _metrics_cache.set(key, metrics)
+    return metrics
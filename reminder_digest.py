@@ -0,0 +1,43 @@
+import pandas as pd
+
+
+def build_digests(df, hoy, horizon_days=30):
+    """
+    Agrupa las tareas pendientes por responsable para enviar un solo correo a cada uno.
+
+    Se incluyen las tareas no cumplidas que ya vencieron o que vencen en los
+    próximos `horizon_days` días. La agrupación por ('Email', 'Responsable') se
+    hace con un único `groupby` y las tareas de cada resumen quedan ordenadas
+    por fecha de vencimiento.
+
+    Args:
+        df (pd.DataFrame): La tabla de tareas, con la columna 'Email'.
+        hoy (datetime): Fecha de referencia para los vencimientos.
+        horizon_days (int | None): Días hacia adelante a incluir; None para
+            incluir todas las tareas pendientes.
+
+    Returns:
+        list[dict]: Un recordatorio de tipo 'digest' por responsable, con el
+        formato que espera `email_sender.send_bulk_reminders`.
+    """
+    hoy = pd.Timestamp(hoy)
+    seleccion = (df['Estado'] != 'CUMPLIDA').to_numpy()
+    if horizon_days is not None:
+        limite = hoy.normalize() + pd.Timedelta(days=horizon_days + 1)
+        seleccion = seleccion & (df['Fecha de fin'] < limite).to_numpy()
+
+    pendientes = df.loc[seleccion, ['Email', 'Responsable', 'Hito/Actividad', 'Fecha de fin']]
+    pendientes = pendientes.assign(vencida=pendientes['Fecha de fin'] < hoy).sort_values('Fecha de fin', kind='stable')
+
+    digests = []
+    for (email, responsable), grupo in pendientes.groupby(['Email', 'Responsable'], sort=False, observed=True):
+        digests.append({
+            "kind": "digest",
+            "receiver_email": email,
+            "responsible_name": responsable,
+            "tasks": [
+                {"task_name": tarea, "due_date": fecha_fin, "overdue": bool(vencida)}
+                for tarea, fecha_fin, vencida in zip(grupo['Hito/Actividad'], grupo['Fecha de fin'], grupo['vencida'])
+            ],
+        })
+    return digests
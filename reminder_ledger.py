@@ -0,0 +1,137 @@
+import os
+import time
+
+import pandas as pd
+
+from email_outbox import PENDING, SENT
+from sqlite_db import chunked, connect
+
+# Estado de un recordatorio que el programador volverá a intentar tras un error transitorio
+RETRYING = 'retrying'
+
+# Base de datos SQLite con el historial de recordatorios por tarea
+LEDGER_DB_PATH = os.environ.get("REMINDER_LEDGER_DB", "reminder_ledger.db")
+
+# Columnas que identifican una tarea de forma estable entre cargas del plan
+TASK_KEY_COLUMNS = ['Hito/Actividad', 'Responsable', 'Fecha de fin']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reminder_ledger (
+    task_key INTEGER PRIMARY KEY,
+    task_name TEXT,
+    responsible_name TEXT,
+    due_date TEXT,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    sent_at REAL
+);
+"""
+
+
+def task_keys(df):
+    """
+    Calcula la clave estable de cada tarea.
+
+    La clave es un hash de 64 bits de la actividad, el responsable y la fecha de
+    fin, de modo que no depende del índice del DataFrame ni del orden de las
+    filas: la misma tarea conserva su clave al recargar el plan o en otra sesión.
+
+    Args:
+        df (pd.DataFrame): Las tareas, con las columnas de `TASK_KEY_COLUMNS`.
+
+    Returns:
+        np.ndarray: Las claves (int64), en el orden de las filas.
+    """
+    columnas = pd.DataFrame({
+        'Hito/Actividad': df['Hito/Actividad'].astype(object),
+        'Responsable': df['Responsable'].astype(object),
+        # La resolución de la fecha no debe cambiar la clave
+        'Fecha de fin': df['Fecha de fin'].astype('datetime64[s]').astype('int64'),
+    })
+    return pd.util.hash_pandas_object(columnas, index=False).to_numpy().view('int64')
+
+
+class ReminderLedger:
+    """
+    Registro persistente de los recordatorios enviados por tarea.
+
+    Cada tarea ocupa una fila indexada por su clave estable (`task_keys`), con el
+    estado del último recordatorio ('pending', 'retrying', 'sent' o 'failed') y
+    la hora de envío. Al vivir en SQLite, el registro es compartido por todas las
+    sesiones y sobrevive a los reinicios de la aplicación.
+
+    Args:
+        db_path (str): Ruta de la base de datos SQLite.
+    """
+
+    def __init__(self, db_path=LEDGER_DB_PATH):
+        self.db_path = db_path
+        with connect(self.db_path) as conn:
+            conn.executescript(_SCHEMA)
+
+    def lookup(self, keys):
+        """
+        Consulta el estado del recordatorio de varias tareas en una sola consulta.
+
+        Args:
+            keys (iterable[int]): Claves de tarea calculadas con `task_keys`.
+
+        Returns:
+            dict[int, str]: Estado del último recordatorio de cada tarea registrada.
+            Las tareas sin recordatorio no aparecen.
+        """
+        keys = [int(key) for key in keys]
+        result = {}
+        with connect(self.db_path) as conn:
+            for chunk, placeholders in chunked(keys):
+                rows = conn.execute(
+                    f"SELECT task_key, status FROM reminder_ledger WHERE task_key IN ({placeholders})", chunk)
+                result.update(rows)
+        return result
+
+    def record(self, reminders, statuses):
+        """
+        Registra el estado de varios recordatorios individuales.
+
+        Los recordatorios sin 'task_key' (por ejemplo, los resúmenes por
+        responsable) se ignoran. Un 'sent' nunca vuelve a 'pending' ni a
+        'retrying': si la cola confirma el envío antes de que se registre la
+        tarea como encolada, el registro conserva el envío. Su firma coincide
+        con el parámetro `on_status` de `EmailOutbox`, para que la cola
+        actualice el registro al enviar.
+
+        Args:
+            reminders (list[dict]): Recordatorios con la clave 'task_key'.
+            statuses (list[str]): Estado de cada recordatorio ('pending', 'retrying', 'sent' o 'failed').
+        """
+        now = time.time()
+        rows = []
+        for reminder, status in zip(reminders, statuses):
+            if reminder.get("task_key") is None:
+                continue
+            due_date = reminder.get("due_date")
+            rows.append((
+                int(reminder["task_key"]), reminder.get("task_name"), reminder.get("responsible_name"),
+                due_date.isoformat() if due_date is not None else None,
+                status, now, now if status == SENT else None,
+            ))
+        if not rows:
+            return
+        with connect(self.db_path) as conn:
+            # Un 'sent' anterior conserva su estado frente a 'pending' o 'retrying' y su hora de envío
+            conn.executemany(
+                "INSERT INTO reminder_ledger (task_key, task_name, responsible_name, due_date, status, updated_at, sent_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(task_key) DO UPDATE SET "
+                f"status = CASE WHEN reminder_ledger.status = '{SENT}' AND excluded.status IN ('{PENDING}', '{RETRYING}') "
+                "THEN reminder_ledger.status ELSE excluded.status END, "
+                "updated_at = excluded.updated_at, "
+                "sent_at = COALESCE(excluded.sent_at, reminder_ledger.sent_at)",
+                rows,
+            )
+
+    def counts(self):
+        """Devuelve el número de tareas en cada estado."""
+        with connect(self.db_path) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM reminder_ledger GROUP BY status"))
+
@@ -0,0 +1,341 @@
+"""
+Programador de recordatorios: envía automáticamente el recordatorio de cada
+tarea pendiente cuando se acerca su fecha de fin.
+
+Uso:
+    python reminder_scheduler.py plan.xlsx [--lead-days 1]
+    python reminder_scheduler.py --store [--lead-days 1]
+
+Al arrancar (y al recargar) las tareas cuyo momento de envío ya pasó solo se
+envían si no pasó hace más de `--catch-up-days` días (por defecto, 1): así un
+plan con muchas tareas vencidas no dispara de golpe todos sus recordatorios.
+Con `--catch-up-days` mayor se recuperan también los atrasados más antiguos.
+
+Un envío que falla por un error transitorio se reintenta pasados unos minutos
+y queda en el registro como 'retrying' (no como 'pending', que indica que el
+correo está en la cola de los dashboards): así el programador lo sigue
+enviando, también tras un reinicio.
+
+Con `--store` las tareas pendientes se leen del plan actual del almacén de
+los dashboards (`task_store.TaskStore`): el último que se subió o editó.
+Enviar SIGHUP al proceso fuerza la recarga del plan; además, se recarga solo
+cuando cambia la fecha de modificación del archivo o el plan actual del
+almacén (o su versión).
+"""
+import argparse
+import datetime
+import heapq
+import logging
+import os
+import signal
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_project_file
+from email_outbox import FAILED, PENDING, SENT
+from email_sender import send_bulk_reminders
+from reminder_ledger import RETRYING, TASK_KEY_COLUMNS, ReminderLedger, task_keys
+from task_store import TASK_STORE_DB_PATH, TaskStore, list_datasets
+
+logger = logging.getLogger(__name__)
+
+# Días de anticipación con que se envía el recordatorio antes de la fecha de fin
+DEFAULT_LEAD_DAYS = float(os.environ.get("REMINDER_LEAD_DAYS", 1))
+# Segundos entre comprobaciones de la fecha de modificación del plan
+DEFAULT_CHECK_INTERVAL = float(os.environ.get("REMINDER_CHECK_INTERVAL", 60))
+# Segundos de espera antes de reintentar un envío fallido por un error transitorio
+DEFAULT_RETRY_DELAY = 300.0
+# Días de retraso máximos con que se envía un recordatorio cuyo momento ya pasó al cargar el plan
+DEFAULT_CATCH_UP_DAYS = float(os.environ.get("REMINDER_CATCH_UP_DAYS", 1))
+
+
+def _now_seconds():
+    """Hora local actual en segundos, en la misma escala que las fechas del plan."""
+    return float(np.datetime64(datetime.datetime.now(), 's').astype(np.int64))
+
+
+class ReminderScheduler:
+    """
+    Envía los recordatorios de las tareas pendientes en el momento en que vencen.
+
+    Las tareas pendientes se guardan en un montículo (min-heap) ordenado por la
+    fecha de envío (fecha de fin menos la anticipación), de modo que el proceso
+    duerme hasta el próximo envío sin recorrer la tabla. Al recargar el plan solo
+    se añaden al montículo las tareas nuevas; las que desaparecen o se cumplen se
+    descartan de forma perezosa cuando llegan a la cima. Antes de enviar se
+    consulta el registro de recordatorios para no repetir los ya enviados.
+
+    Args:
+        plan_path (str | None): Ruta del archivo Excel con el plan.
+        lead_days (float): Días de anticipación del recordatorio.
+        check_interval (float): Segundos entre comprobaciones de cambios del plan.
+        retry_delay (float): Segundos de espera para reintentar un envío fallido.
+        catch_up_days (float): Las tareas nuevas cuyo momento de envío pasó hace más
+            de estos días no se programan (p. ej. las ya vencidas al arrancar).
+        ledger (ReminderLedger, optional): Registro de recordatorios enviados.
+        sender (callable): Función de envío con la interfaz de `send_bulk_reminders`.
+        store_path (str, optional): Ruta del almacén de los dashboards; si se indica, se
+            leen las tareas de su plan actual en lugar del archivo.
+    """
+
+    def __init__(self, plan_path, lead_days=DEFAULT_LEAD_DAYS, check_interval=DEFAULT_CHECK_INTERVAL,
+                 retry_delay=DEFAULT_RETRY_DELAY, ledger=None, sender=send_bulk_reminders, store_path=None,
+                 catch_up_days=DEFAULT_CATCH_UP_DAYS):
+        self.plan_path = plan_path
+        self.lead_seconds = lead_days * 86400
+        self.check_interval = check_interval
+        self.retry_delay = retry_delay
+        self.catch_up_seconds = catch_up_days * 86400
+        self.ledger = ledger if ledger is not None else ReminderLedger()
+        self.sender = sender
+        self.store_path = store_path
+        self._heap = [] # (segundo de envío, clave de tarea)
+        self._tasks = {} # clave de tarea -> (segundo de envío, recordatorio)
+        self._plan_version = None # Fecha de modificación del archivo o (plan, versión) actual del almacén
+        self._reload_requested = threading.Event()
+        self._stopping = threading.Event()
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def load_tasks(self, df, now=None):
+        """
+        Sincroniza el montículo con una versión del plan.
+
+        Solo se insertan las tareas que no estaban programadas; las que ya no
+        están pendientes se quitan del diccionario de tareas y sus entradas del
+        montículo se ignoran al salir (borrado perezoso).
+
+        Args:
+            df (pd.DataFrame): Las tareas del plan, con la columna 'Email'.
+            now (float, optional): Hora de referencia en segundos; por defecto, la actual.
+        """
+        now = _now_seconds() if now is None else now
+        if 'Email' not in df.columns:
+            logger.warning("El plan no tiene la columna 'Email': no se programará ningún recordatorio.")
+            df = df.iloc[:0]
+        pendientes = df[(df['Estado'] != 'CUMPLIDA').to_numpy() & df['Email'].notna().to_numpy()]
+
+        claves = task_keys(pendientes)
+        envios = pendientes['Fecha de fin'].to_numpy().astype('datetime64[s]').astype(np.int64) - self.lead_seconds
+
+        nuevas = {}
+        for clave, envio, email, tarea, responsable, fecha_fin in zip(
+                claves.tolist(), envios.tolist(), pendientes['Email'], pendientes['Hito/Actividad'],
+                pendientes['Responsable'], pendientes['Fecha de fin']):
+            anterior = self._tasks.get(clave)
+            # Una tarea ya programada conserva su hora de envío (p. ej. si se está reintentando)
+            envio = anterior[0] if anterior is not None else envio
+            nuevas[clave] = (envio, {
+                "receiver_email": email, "task_name": tarea, "responsible_name": responsable,
+                "due_date": fecha_fin, "task_key": clave,
+            })
+
+        # Las tareas nuevas cuyo envío pasó hace demasiado no se recuperan
+        candidatas = [clave for clave in nuevas if clave not in self._tasks]
+        limite = now - self.catch_up_seconds
+        atrasadas = [clave for clave in candidatas if nuevas[clave][0] < limite]
+        for clave in atrasadas:
+            del nuevas[clave]
+        if atrasadas:
+            logger.info(f"{len(atrasadas)} tareas con el envío atrasado más de {self.catch_up_seconds / 86400:g} días no se programan.")
+        # Las tareas nuevas cuyo recordatorio ya se envió (o está en cola) tampoco
+        candidatas = [clave for clave in candidatas if clave in nuevas]
+        registradas = self.ledger.lookup(candidatas)
+        for clave in candidatas:
+            if registradas.get(clave) in (SENT, PENDING):
+                del nuevas[clave]
+        agregadas = [(nuevas[clave][0], clave) for clave in candidatas if clave in nuevas]
+        eliminadas = len(self._tasks.keys() - nuevas.keys())
+        self._tasks = nuevas
+        if len(agregadas) > len(self._heap):
+            self._heap.extend(agregadas)
+            heapq.heapify(self._heap)
+        else:
+            for entrada in agregadas:
+                heapq.heappush(self._heap, entrada)
+        # Si las entradas obsoletas dominan el montículo, se reconstruye
+        if len(self._heap) > 2 * len(self._tasks) + 1024:
+            self._heap = [(envio, clave) for clave, (envio, _) in self._tasks.items()]
+            heapq.heapify(self._heap)
+        logger.info(f"Plan sincronizado: {len(agregadas)} tareas nuevas, {eliminadas} retiradas, {len(self._tasks)} programadas.")
+
+    def _current_version(self):
+        if self.store_path is not None:
+            # El plan actual es el último que se subió o editó
+            return next(iter(list_datasets(self.store_path).items()), None)
+        return os.path.getmtime(self.plan_path)
+
+    def reload(self):
+        """Vuelve a leer el plan y sincroniza el montículo."""
+        version = self._current_version()
+        if self.store_path is not None:
+            columnas = TASK_KEY_COLUMNS + ['Estado', 'Email']
+            df = pd.DataFrame(columns=columnas)
+            if version is not None:
+                # El filtro de pendientes y las columnas se resuelven en la base de datos
+                plan = TaskStore(version[0], self.store_path).query_tasks(exclude={'Estado': 'CUMPLIDA'}, columns=columnas)
+                df = plan if len(plan.columns) else df
+        else:
+            with open(self.plan_path, "rb") as f:
+                df = load_project_file(f.read())
+        self._plan_version = version
+        self.load_tasks(df)
+
+    def _plan_changed(self):
+        try:
+            return self._current_version() != self._plan_version
+        except Exception:
+            return False
+
+    def _reschedule(self, claves, envio):
+        for clave in claves:
+            self._tasks[clave] = (envio, self._tasks[clave][1])
+            heapq.heappush(self._heap, (envio, clave))
+
+    def _pop_due(self, now):
+        """Saca del montículo las tareas cuyo envío ya venció (ignorando las obsoletas)."""
+        vencidas = []
+        while self._heap and self._heap[0][0] <= now:
+            envio, clave = heapq.heappop(self._heap)
+            tarea = self._tasks.get(clave)
+            if tarea is None or tarea[0] != envio:
+                continue
+            vencidas.append(clave)
+        return vencidas
+
+    def dispatch_due(self, now=None):
+        """
+        Envía los recordatorios cuyo momento de envío ya llegó.
+
+        Args:
+            now (float, optional): Hora de referencia en segundos; por defecto, la actual.
+
+        Returns:
+            int: Número de recordatorios enviados con éxito.
+        """
+        now = _now_seconds() if now is None else now
+        vencidas = self._pop_due(now)
+        if not vencidas:
+            return 0
+
+        # Una sola consulta al registro para descartar lo ya enviado o en cola
+        try:
+            registradas = self.ledger.lookup(vencidas)
+        except Exception:
+            # Las tareas vuelven al montículo para intentarlo más tarde
+            self._reschedule(vencidas, now + self.retry_delay)
+            raise
+        por_enviar = []
+        for clave in vencidas:
+            if registradas.get(clave) in (SENT, PENDING):
+                del self._tasks[clave]
+            else:
+                por_enviar.append(clave)
+        if not por_enviar:
+            return 0
+
+        reminders = [self._tasks[clave][1] for clave in por_enviar]
+        try:
+            results = list(self.sender(reminders))
+            error = "El envío no devolvió resultado"
+        except Exception as e:
+            logger.error(f"Error inesperado al enviar recordatorios programados: {e}")
+            results = []
+            error = f"Resultado desconocido: {e}"
+        # Sin resultado no se sabe si el correo llegó: no se reintenta para no duplicarlo
+        results += [{"success": False, "error": error, "retryable": False}] * (len(reminders) - len(results))
+        estados = []
+        for clave, reminder, result in zip(por_enviar, reminders, results):
+            if not result["success"] and result.get("retryable", True):
+                # Error transitorio: se vuelve a programar más tarde; 'retrying' no lo descarta en el próximo intento
+                self._reschedule([clave], now + self.retry_delay)
+                estados.append(RETRYING)
+                continue
+            del self._tasks[clave]
+            estados.append(SENT if result["success"] else FAILED)
+        self.ledger.record(reminders, estados)
+        enviados = estados.count(SENT)
+        logger.info(f"{enviados} de {len(reminders)} recordatorios enviados.")
+        return enviados
+
+    def seconds_until_next(self, now=None):
+        """Segundos hasta el próximo envío programado (None si no hay ninguno)."""
+        now = _now_seconds() if now is None else now
+        # Se limpian las entradas obsoletas de la cima para no despertar en vano
+        while self._heap and self._tasks.get(self._heap[0][1], (None,))[0] != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - now, 0)
+
+    def request_reload(self, *_):
+        """Pide recargar el plan en la siguiente vuelta (se usa como manejador de SIGHUP)."""
+        self._reload_requested.set()
+
+    def stop(self, *_):
+        """Detiene el bucle principal."""
+        self._stopping.set()
+        self._reload_requested.set()
+
+    def run(self):
+        """Bucle principal: duerme hasta el próximo envío, una recarga o una comprobación del archivo."""
+        self.reload()
+        ultima_comprobacion = time.monotonic()
+        while not self._stopping.is_set():
+            try:
+                self.dispatch_due()
+            except Exception as e:
+                logger.error(f"Error al enviar recordatorios programados: {e}")
+
+            espera = self.seconds_until_next()
+            espera = self.check_interval if espera is None else min(espera, self.check_interval)
+            self._reload_requested.wait(espera)
+            if self._stopping.is_set():
+                break
+
+            recarga_pedida = self._reload_requested.is_set()
+            self._reload_requested.clear()
+            if not recarga_pedida and time.monotonic() - ultima_comprobacion < self.check_interval:
+                continue
+            ultima_comprobacion = time.monotonic()
+            if recarga_pedida or self._plan_changed():
+                try:
+                    self.reload()
+                except Exception as e:
+                    logger.error(f"Error al recargar el plan: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Envía automáticamente los recordatorios de las tareas próximas a vencer.")
+    parser.add_argument("plan", nargs="?", help="Archivo Excel (.xlsx) con el plan del proyecto")
+    parser.add_argument("--store", action="store_true",
+                        help="Leer las tareas del plan actual del almacén compartido de los dashboards en lugar de un archivo")
+    parser.add_argument("--lead-days", type=float, default=DEFAULT_LEAD_DAYS,
+                        help="Días de anticipación del recordatorio (por defecto: %(default)s)")
+    parser.add_argument("--catch-up-days", type=float, default=DEFAULT_CATCH_UP_DAYS,
+                        help="Días de retraso máximos para enviar un recordatorio atrasado al cargar el plan "
+                             "(por defecto: %(default)s)")
+    parser.add_argument("--check-interval", type=float, default=DEFAULT_CHECK_INTERVAL,
+                        help="Segundos entre comprobaciones de cambios del plan (por defecto: %(default)s)")
+    args = parser.parse_args()
+    if not args.store and args.plan is None:
+        parser.error("indica el archivo del plan o usa --store")
+
+    scheduler = ReminderScheduler(args.plan, lead_days=args.lead_days, check_interval=args.check_interval,
+                                  catch_up_days=args.catch_up_days,
+                                  store_path=TASK_STORE_DB_PATH if args.store else None)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, scheduler.request_reload)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+
+from caching import LRUCache
+from sqlite_db import connect
+
+logger = logging.getLogger(__name__)
+
+# Segundos que una respuesta sigue siendo válida
+RESPONSE_CACHE_TTL = float(os.environ.get("ASSISTANT_RESPONSE_CACHE_TTL", 6 * 3600))
+# Base de datos SQLite del nivel en disco; sin definir, la caché vive solo en memoria
+RESPONSE_CACHE_DB = os.environ.get("ASSISTANT_RESPONSE_CACHE_DB")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_created ON responses (created_at);
+"""
+
+
+def normalize_question(question):
+    """
+    Normaliza una pregunta para que las variantes triviales compartan respuesta.
+
+    Se pasa a minúsculas, se quitan tildes y signos de puntuación y se colapsan
+    los espacios: "¿Qué tareas están vencidas?" y "que tareas estan vencidas"
+    quedan iguales.
+    """
+    texto = unicodedata.normalize('NFKD', question.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", texto).split())
+
+
+def cache_key(question, model_name, context):
+    """Clave de una respuesta: pregunta normalizada, modelo y huella de los datos del contexto."""
+    huella_contexto = hashlib.sha256(context.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{normalize_question(question)}\0{model_name}\0{huella_contexto}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Caché de respuestas del asistente en dos niveles.
+
+    El primer nivel es un LRU en memoria con caducidad, compartido por todas
+    las sesiones del servidor; el segundo, opcional, es una base SQLite que
+    comparten varios procesos y que sobrevive a los reinicios. Como la clave
+    incluye la huella del contexto, una respuesta deja de usarse en cuanto
+    cambian los datos o los filtros.
+
+    Args:
+        maxsize (int): Número máximo de respuestas en memoria.
+        ttl (float): Segundos que una respuesta sigue siendo válida.
+        db_path (str | None): Ruta de la base SQLite del nivel en disco; None para desactivarlo.
+    """
+
+    def __init__(self, maxsize=256, ttl=RESPONSE_CACHE_TTL, db_path=RESPONSE_CACHE_DB):
+        self.ttl = ttl
+        self.db_path = db_path
+        self._memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        if db_path:
+            with connect(self.db_path) as conn:
+                conn.executescript(_SCHEMA)
+
+    def get(self, question, model_name, context):
+        """
+        Busca una respuesta guardada.
+
+        Returns:
+            str | None: La respuesta, o None si no hay una vigente.
+        """
+        key = cache_key(question, model_name, context)
+        response = self._memory.get(key)
+        if response is not None or not self.db_path:
+            return response
+        try:
+            with connect(self.db_path) as conn:
+                row = conn.execute(
+                    "SELECT response FROM responses WHERE key = ? AND created_at >= ?",
+                    (key, time.time() - self.ttl),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error al leer la caché de respuestas: {e}")
+            return None
+        if row is None:
+            return None
+        # La respuesta sube a memoria para las siguientes consultas de este proceso
+        self._memory.set(key, row[0])
+        return row[0]
+
+    def set(self, question, model_name, context, response):
+        """Guarda una respuesta en memoria y, si está activo, en disco."""
+        key = cache_key(question, model_name, context)
+        self._memory.set(key, response)
+        if not self.db_path:
+            return
+        ahora = time.time()
+        try:
+            with connect(self.db_path) as conn:
+                conn.execute(
+                    "INSERT INTO responses (key, response, created_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET response = excluded.response, created_at = excluded.created_at",
+                    (key, response, ahora),
+                )
+                conn.execute("DELETE FROM responses WHERE created_at < ?", (ahora - self.ttl,))
+        except sqlite3.Error as e:
+            logger.error(f"Error al guardar en la caché de respuestas: {e}")
+
+    def clear(self):
+        """Vacía ambos niveles."""
+        self._memory.clear()
+        if self.db_path:
+            with connect(self.db_path) as conn:
+                conn.execute("DELETE FROM responses")
@@ -1,11 +1,18 @@
 # 1. Importar las librerías necesarias
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import warnings
 import os
 import google.generativeai as genai
 from datetime import datetime
+from task_table import apply_editor_changes, build_filter_index, editor_changed_ids, filter_options, select_tasks
+from metrics import key_metrics
+from data_loader import file_digest, load_project_file
+from task_store import TaskStore
+from assistant import ask_stream, collect_chunks
+from intent_router import route_question
+from chat_history import ChatHistory
+from gantt import GANTT_DETAIL_LIMIT, gantt_figure
 
 # Ignorar advertencias futuras que puedan surgir de las librerías
 warnings.simplefilter(action='ignore', category=FutureWarning)
@@ -14,22 +21,10 @@ warnings.simplefilter(action='ignore', category=FutureWarning)
 st.set_page_config(page_title="Dashboard de Proyecto con IA", page_icon="🚀", layout="wide")
 
 # --- FUNCIONES AUXILIARES ---
-def wrap_text(text, length=50):
-    """Ajusta el texto a una longitud máxima por línea para el gráfico."""
-    if len(text) > length:
-        # Usamos <br> para que Plotly lo interprete como un salto de línea
-        words = text.split()
-        lines = []
-        current_line = ""
-        for word in words:
-            if len(current_line + " " + word) <= length:
-                current_line += " " + word
-            else:
-                lines.append(current_line.strip())
-                current_line = word
-        lines.append(current_line.strip())
-        return "<br>".join(lines)
-    return text
+@st.cache_resource(max_entries=32)
+def get_task_store(dataset):
+    """Almacén de un plan, compartido por las sesiones que suben el mismo archivo."""
+    return TaskStore(dataset)
 
 # --- TÍTULO PRINCIPAL ---
 st.title("🚀 Dashboard de Gestión de Proyectos con IA")
@@ -52,6 +47,14 @@ except ImportError:
 # --- INICIALIZACIÓN DE SESSION STATE ---
 if 'df' not in st.session_state:
     st.session_state.df = None
+if 'source_digest' not in st.session_state:
+    st.session_state.source_digest = None # Huella del archivo cargado actualmente
+if 'data_version' not in st.session_state:
+    st.session_state.data_version = None # Versión de los datos en memoria (cambia al cargar o editar)
+if 'filter_options' not in st.session_state:
+    st.session_state.filter_options = {} # Valores únicos precalculados para los filtros
+if 'filter_index' not in st.session_state:
+    st.session_state.filter_index = {} # Índice invertido valor -> posiciones de filas
 
 # --- BARRA LATERAL (SIDEBAR) ---
 with st.sidebar:
@@ -60,50 +63,60 @@ with st.sidebar:
 
     if uploaded_file:
         try:
-            df_cargado = pd.read_excel(uploaded_file)
-            # Definimos los nombres EXACTOS de las columnas que usaremos
-            required_cols = ['Hito/Actividad', 'Fecha de inicio', 'Fecha de fin', 'Etapa', 'Responsable', 'Estado']
-            
-            # Limpieza de espacios en blanco
-            for col in required_cols:
-                if col in df_cargado.columns and df_cargado[col].dtype == 'object':
-                    df_cargado[col] = df_cargado[col].str.strip()
-            
-            # Conversión de fechas
-            df_cargado['Fecha de inicio'] = pd.to_datetime(df_cargado['Fecha de inicio'], errors='coerce')
-            df_cargado['Fecha de fin'] = pd.to_datetime(df_cargado['Fecha de fin'], errors='coerce')
-            
-            # Añadir columna de notificación si no existe
-            if 'Notificación Enviada' not in df_cargado.columns:
-                df_cargado['Notificación Enviada'] = False
+            file_bytes = uploaded_file.getvalue()
+            huella = file_digest(file_bytes)
 
-            st.session_state.df = df_cargado.dropna(subset=['Fecha de inicio', 'Fecha de fin'])
+            # Solo se procesa el archivo cuando cambia su contenido; así los reruns
+            # no re-parsean el Excel ni descartan los cambios guardados en la tabla.
+            # Cada archivo tiene su propio plan en el almacén: si otra sesión ya subió
+            # este mismo archivo, se conserva lo guardado (incluidas sus ediciones)
+            tienda = get_task_store(huella)
+            if tienda.version() is None:
+                # Limpieza de espacios, conversión de fechas y descarte de filas sin fechas
+                tienda.ingest(load_project_file(file_bytes, digest=huella))
+            st.session_state.source_digest = huella
             st.success("Archivo cargado y procesado.", icon="✅")
         except Exception as e:
+            # La sesión sigue con el plan que tenía; el archivo se reintenta en el
+            # siguiente rerun porque su plan no llegó a guardarse
             st.error(f"Error al procesar el archivo: {e}")
-            st.session_state.df = None
+
+    # El plan de esta sesión se lee cuando cambia su versión: al subir un archivo o
+    # cuando otra sesión que trabaja con el mismo archivo guarda cambios
+    tienda = get_task_store(st.session_state.source_digest) if st.session_state.source_digest else None
+    version_tienda = tienda.version() if tienda is not None else None
+    if version_tienda is not None and version_tienda != st.session_state.data_version:
+        df_tienda = tienda.load()
+        # Añadir columna de notificación si no existe
+        if 'Notificación Enviada' not in df_tienda.columns:
+            df_tienda['Notificación Enviada'] = False
+        st.session_state.df = df_tienda
+        st.session_state.filter_options = filter_options(st.session_state.df)
+        st.session_state.filter_index = build_filter_index(st.session_state.df)
+        st.session_state.data_version = version_tienda
 
     if st.session_state.df is not None:
         df_display = st.session_state.df
         st.divider()
         st.header("2. Filtros del Dashboard")
-        etapas_unicas = df_display['Etapa'].dropna().unique().tolist()
-        responsables_unicos = df_display['Responsable'].dropna().unique().tolist()
-        estados_unicos = df_display['Estado'].dropna().unique().tolist()
+        opciones = st.session_state.filter_options
+        etapas_unicas = opciones.get('Etapa', [])
+        responsables_unicos = opciones.get('Responsable', [])
+        estados_unicos = opciones.get('Estado', [])
 
         selected_etapa = st.selectbox("Filtrar por Etapa:", ["Todas"] + etapas_unicas)
         selected_responsable = st.selectbox("Filtrar por Responsable:", ["Todos"] + responsables_unicos)
         selected_estado = st.selectbox("Filtrar por Estado:", ["Todos"] + estados_unicos)
         
-        # Aplicación de filtros
-        df_filtrado = df_display.copy()
-        if selected_etapa != "Todas":
-            df_filtrado = df_filtrado[df_filtrado['Etapa'] == selected_etapa]
-        if selected_responsable != "Todos":
-            df_filtrado = df_filtrado[df_filtrado['Responsable'] == selected_responsable]
-        if selected_estado != "Todos":
-            df_filtrado = df_filtrado[df_filtrado['Estado'] == selected_estado]
+        # Aplicación de filtros: intersección de las posiciones precalculadas
+        filtros = {
+            'Etapa': None if selected_etapa == "Todas" else selected_etapa,
+            'Responsable': None if selected_responsable == "Todos" else selected_responsable,
+            'Estado': None if selected_estado == "Todos" else selected_estado,
+        }
+        df_filtrado = select_tasks(df_display, st.session_state.filter_index, filtros)
     else:
+        filtros = {}
         df_filtrado = pd.DataFrame() # Dataframe vacío si no hay nada cargado
 
     st.divider()
@@ -113,39 +126,44 @@ with st.sidebar:
         st.warning("Define tu `GEMINI_API_KEY` en un archivo `.env` para activar el chat.", icon="⚠️")
     else:
         model = genai.GenerativeModel('gemini-1.5-flash')
-        if "messages" not in st.session_state:
-            st.session_state.messages = []
+        if "chat_history" not in st.session_state:
+            st.session_state.chat_history = ChatHistory()
+        historial = st.session_state.chat_history
 
-        for message in st.session_state.messages:
+        # Solo se dibujan los últimos mensajes; los anteriores se cargan a petición
+        if historial.hidden_count() and st.button(f"Cargar mensajes anteriores ({historial.hidden_count()})"):
+            historial.show_older()
+        for message in historial.visible_messages():
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
         
         if prompt := st.chat_input("Pregúntale a los datos..."):
-            st.session_state.messages.append({"role": "user", "content": prompt})
+            # Al preguntar algo nuevo la vista vuelve a la última ventana de mensajes
+            historial.reset_view()
+            historial.append("user", prompt)
             with st.chat_message("user"):
                 st.markdown(prompt)
             
             with st.chat_message("assistant"):
-                with st.spinner("Pensando..."):
-                    datos_contexto = df_filtrado.to_markdown(index=False)
-                    prompt_completo = f"""Eres un analista de datos experto y amigable. Tu única fuente de información son los siguientes datos extraídos de un dashboard de proyectos. No puedes usar información externa.
-
-**Datos Actuales del Dashboard:**
-{datos_contexto}
-
-**Pregunta del Usuario:**
-"{prompt}"
-
-Basándote EXCLUSIVAMENTE en la tabla de datos proporcionada, responde a la pregunta del usuario. Si la respuesta no está en los datos, indícalo amablemente."""
-
+                # Los conteos y listados habituales se responden con pandas, sin llamar a la IA
+                response_text = route_question(df_filtrado, prompt, data_version=st.session_state.data_version,
+                                               selections=filtros) if not df_filtrado.empty else None
+                if response_text is not None:
+                    st.markdown(response_text)
+                else:
+                    fragmentos = []
                     try:
-                        response = model.generate_content(prompt_completo)
-                        response_text = response.text
+                        # El prompt lleva un resumen agregado y solo las filas relacionadas con la pregunta;
+                        # la respuesta se muestra a medida que llega
+                        st.write_stream(collect_chunks(
+                            ask_stream(model, df_filtrado, prompt, st.session_state.data_version, filtros), fragmentos))
                     except Exception as e:
-                        response_text = f"Ocurrió un error al contactar a la IA: {e}"
-                    
-                    st.markdown(response_text)
-            st.session_state.messages.append({"role": "assistant", "content": response_text})
+                        # Lo ya mostrado se conserva en el historial, seguido del error
+                        error = f"Ocurrió un error al contactar a la IA: {e}"
+                        st.markdown(error)
+                        fragmentos.append(f"\n\n{error}" if fragmentos else error)
+                    response_text = "".join(fragmentos)
+            historial.append("assistant", response_text)
 
 # --- CUERPO PRINCIPAL ---
 if st.session_state.df is None:
@@ -155,44 +173,40 @@ if st.session_state.df is None:
 # --- SECCIÓN DE MÉTRICAS CLAVE ---
 st.header("📊 Métricas Clave del Proyecto")
 if not df_filtrado.empty:
-    total_actividades = len(df_filtrado)
-    completadas = df_filtrado['Estado'].str.contains("CUMPLIDA", na=False).sum()
-    en_curso = df_filtrado[df_filtrado['Estado'] == "A TIEMPO"].shape[0]
-    progreso_general = (completadas / total_actividades) * 100 if total_actividades > 0 else 0
+    hoy = pd.Timestamp.now().floor('min')
+    metricas = key_metrics(df_filtrado, st.session_state.data_version, filtros, hoy)
 
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total de Actividades", f"{total_actividades} 📝")
-    col2.metric("Actividades Completadas", f"{completadas} ✅")
-    col3.metric("Actividades En Curso", f"{en_curso} ⏳")
-    st.progress(int(progreso_general), text=f"Progreso General (Actividades Completadas): {progreso_general:.1f}%")
+    col1.metric("Total de Actividades", f"{metricas.total} 📝")
+    col2.metric("Actividades Completadas", f"{metricas.completadas} ✅")
+    col3.metric("Actividades En Curso", f"{metricas.en_proceso} ⏳")
+    st.progress(int(metricas.progreso), text=f"Progreso General (Actividades Completadas): {metricas.progreso:.1f}%")
 else:
     st.warning("No hay actividades que coincidan con los filtros seleccionados.")
 
 # --- DIAGRAMA DE GANTT ---
 st.header("🗓️ Cronograma de Actividades (Gantt)")
 if not df_filtrado.empty:
-    # Aplicar el ajuste de texto a la columna de actividad para el gráfico
-    df_gantt = df_filtrado.copy()
-    df_gantt['Actividad_Ajustada'] = df_gantt['Hito/Actividad'].apply(lambda x: wrap_text(x, 60))
-
-    fig = px.timeline(
-        df_gantt,
-        x_start='Fecha de inicio',
-        x_end='Fecha de fin',
-        y='Actividad_Ajustada',
+    # Con muchas tareas el Gantt se resume por Etapa; el selector permite ver el detalle de una
+    df_gantt, grupo_gantt, detalle_gantt = df_filtrado, 'Etapa', None
+    if len(df_filtrado) > GANTT_DETAIL_LIMIT:
+        etapas_gantt = sorted(df_filtrado['Etapa'].dropna().unique())
+        detalle_gantt = st.selectbox("Nivel de detalle del Gantt", ["Resumen por Etapa"] + etapas_gantt, key="gantt_detalle")
+        if detalle_gantt != "Resumen por Etapa":
+            df_gantt, grupo_gantt = df_filtrado[df_filtrado['Etapa'] == detalle_gantt], None
+
+    # La figura se reutiliza mientras no cambien los datos, los filtros ni el nivel de detalle
+    fig = gantt_figure(
+        df_gantt, st.session_state.data_version, {**filtros, 'Gantt': detalle_gantt},
+        start='Fecha de inicio',
+        end='Fecha de fin',
+        label='Hito/Actividad',
         color='Estado',
+        group=grupo_gantt,
         title="Cronograma por Estado de Actividad",
-        hover_name='Hito/Actividad',
-        custom_data=['Responsable', 'Etapa']
-    )
-    fig.update_yaxes(autorange="reversed", title="Actividad")
-    fig.update_xaxes(title="Fecha")
-    fig.update_traces(
-        hovertemplate="<b>%{hover_name}</b><br><br>" +
-                      "<b>Responsable:</b> %{customdata[0]}<br>" +
-                      "<b>Etapa:</b> %{customdata[1]}<br>" +
-                      "<b>Inicio:</b> %{x[0]|%d-%b-%Y}<br>" +
-                      "<b>Fin:</b> %{x[1]|%d-%b-%Y}<extra></extra>"
+        hover_data=['Responsable', 'Etapa'],
+        # El ajuste de texto solo se aplica a las tareas que se dibujan una a una
+        wrap_width=60,
     )
     st.plotly_chart(fig, use_container_width=True)
 else:
@@ -202,7 +216,10 @@ else:
 st.header("📋 Gestionar Tareas del Proyecto")
 st.markdown("Puedes editar, agregar o eliminar tareas directamente en esta tabla. Los cambios se reflejarán en todo el dashboard.")
 
-edited_df = st.data_editor(
+# La clave del editor cambia con la versión de los datos: tras guardar, el editor
+# arranca sin cambios pendientes sobre la tabla nueva
+clave_editor = f"data_editor_{st.session_state.data_version}"
+st.data_editor(
     df_filtrado,
     num_rows="dynamic", # Permite agregar y eliminar filas
     use_container_width=True,
@@ -211,19 +228,33 @@ edited_df = st.data_editor(
         "Fecha de fin": st.column_config.DateColumn("Fecha de fin", format="YYYY-MM-DD"),
         "Notificación Enviada": st.column_config.CheckboxColumn("Notificación Enviada", default=False)
     },
-    key="data_editor"
+    key=clave_editor
 )
 
-# Lógica para actualizar el dataframe principal en session_state con los cambios
-if edited_df is not None and not edited_df.equals(df_filtrado):
-    # Esto es complejo porque 'edited_df' solo tiene las filas filtradas.
-    # Necesitamos una forma de mapear los cambios de vuelta al dataframe original.
-    # Una estrategia simple es actualizar st.session_state.df con la tabla editada,
-    # pero esto puede perder las filas no filtradas.
-    # Por ahora, una solución más segura es mostrar un botón para confirmar los cambios.
+# El editor guarda en session_state solo los cambios (filas editadas, añadidas y
+# eliminadas), así que no hace falta comparar la tabla completa en cada rerun
+cambios = st.session_state.get(clave_editor, {})
+if any(cambios.get(tipo) for tipo in ('edited_rows', 'added_rows', 'deleted_rows')):
     if st.button("Guardar Cambios en la Tabla"):
-        # Actualizar el estado de la sesión con los datos editados.
-        # Esta es una implementación simple. Una app real requeriría una lógica de fusión más robusta.
-        st.session_state.df = pd.concat([st.session_state.df[~st.session_state.df.index.isin(df_filtrado.index)], edited_df])
+        # Los cambios se aplican por identificador de tarea: las filas ocultas por los filtros no se tocan.
+        # Las filas nuevas reciben identificadores de la secuencia del plan, compartida entre sesiones
+        tienda = get_task_store(st.session_state.source_digest)
+        if tienda.version() is None:
+            # El plan se borró del almacén por antiguo: se vuelve a guardar la copia de esta sesión
+            st.session_state.data_version = tienda.ingest(st.session_state.df)
+        nuevos_ids = tienda.reserve_ids(len(cambios.get('added_rows') or []))
+        st.session_state.df = apply_editor_changes(st.session_state.df, df_filtrado.index, cambios, nuevos_ids)
+        # Al almacén compartido solo se escriben las filas editadas o añadidas y las eliminadas
+        modificadas, eliminadas = editor_changed_ids(df_filtrado.index, cambios, nuevos_ids)
+        version, anterior = tienda.apply_changes(st.session_state.df.loc[modificadas], deleted_ids=eliminadas)
+        if anterior == st.session_state.data_version:
+            st.session_state.filter_options = filter_options(st.session_state.df)
+            st.session_state.filter_index = build_filter_index(st.session_state.df)
+            st.session_state.data_version = version
+        else:
+            # Otra sesión guardó cambios entretanto: la copia de esta sesión no los tiene, así
+            # que el plan se vuelve a leer del almacén en el rerun (y las cachés por versión
+            # no se llenan con una tabla desactualizada)
+            st.session_state.data_version = None
         st.success("¡Cambios guardados! El dashboard se actualizará.")
-        st.rerun()
\ No newline at end of file
+        st.rerun()
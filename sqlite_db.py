@@ -0,0 +1,45 @@
+import contextlib
+import sqlite3
+
+# SQLite limita el número de parámetros por consulta
+MAX_PARAMETERS = 900
+
+
+@contextlib.contextmanager
+def connect(db_path):
+    """
+    Abre una conexión por operación (SQLite no comparte conexiones entre hilos).
+
+    La base se usa en modo WAL, de modo que las lecturas de otras sesiones o
+    procesos no esperan a las escrituras. Al salir del bloque se confirma la
+    transacción, o se deshace si hubo una excepción, y se cierra la conexión.
+
+    Args:
+        db_path (str): Ruta de la base de datos SQLite.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def chunked(values, size=MAX_PARAMETERS):
+    """
+    Reparte los parámetros de una cláusula `IN (...)` en trozos que SQLite admite.
+
+    Args:
+        values (list): Los parámetros.
+        size (int): Parámetros por trozo.
+
+    Yields:
+        tuple[list, str]: Cada trozo y sus marcadores ("?,?,...").
+    """
+    for start in range(0, len(values), size):
+        chunk = values[start:start + size]
+        yield chunk, ",".join("?" * len(chunk))
@@ -0,0 +1,385 @@
+import datetime
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from caching import LRUCache
+from sqlite_db import chunked, connect
+from task_table import compact_tasks
+
+# Base de datos SQLite con los planes que comparten las sesiones
+TASK_STORE_DB_PATH = os.environ.get("TASK_STORE_DB", "task_store.db")
+
+# Planes que se conservan en el almacén; al ingerir uno nuevo se borran los menos recientes
+TASK_STORE_MAX_DATASETS = int(os.environ.get("TASK_STORE_MAX_DATASETS", 8))
+
+# Columnas con índice para resolver los filtros en la base de datos
+INDEXED_COLUMNS = ['Etapa', 'Responsable', 'Estado', 'Fecha de fin']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    dataset TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    next_id INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Tablas ya leídas, por (ruta de la base, plan, versión): las sesiones abren el plan sin releerlo
+_load_cache = LRUCache(maxsize=4)
+
+
+def _quote(column):
+    """Entrecomilla un nombre de columna para usarlo en SQL."""
+    return '"' + str(column).replace('"', '""') + '"'
+
+
+def _column_kind(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'date'
+    if pd.api.types.is_bool_dtype(series):
+        return 'bool'
+    if pd.api.types.is_timedelta64_dtype(series):
+        return 'timedelta'
+    return 'value'
+
+
+def _table_name(dataset):
+    """Tabla de un plan: el nombre sale de un hash, así que cualquier clave es válida."""
+    return "tasks_" + hashlib.sha256(str(dataset).encode("utf-8")).hexdigest()[:16]
+
+
+def _ensure_schema(conn):
+    conn.executescript(_SCHEMA)
+    # Bases creadas antes de que existiera la secuencia de identificadores
+    if 'next_id' not in {fila[1] for fila in conn.execute("PRAGMA table_info(datasets)")}:
+        conn.execute("ALTER TABLE datasets ADD COLUMN next_id INTEGER NOT NULL DEFAULT 0")
+
+
+def list_datasets(db_path=TASK_STORE_DB_PATH):
+    """
+    Planes guardados en el almacén.
+
+    Args:
+        db_path (str): Ruta de la base de datos SQLite.
+
+    Returns:
+        dict[str, str]: Versión de cada plan, del más reciente al más antiguo.
+    """
+    if not os.path.exists(db_path):
+        return {}
+    with connect(db_path) as conn:
+        _ensure_schema(conn)
+        return dict(conn.execute("SELECT dataset, version FROM datasets ORDER BY updated_at DESC"))
+
+
+def _string_columns(df):
+    """La tabla con los encabezados como texto (Excel admite encabezados numéricos, p. ej. un año)."""
+    if all(isinstance(columna, str) for columna in df.columns):
+        return df
+    return df.rename(columns=str)
+
+
+def _encode_cell(value):
+    """
+    Convierte una celda a un tipo que SQLite puede guardar.
+
+    Las fechas, horas y duraciones que llegan en columnas de tipo `object`
+    (p. ej. columnas que mezclan fechas y texto) se guardan como BLOB con una
+    etiqueta de tipo, para recuperarlas tal cual con `_decode_cell`.
+    """
+    if value is None or value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float, str, bytes)):
+        return value
+    if isinstance(value, datetime.datetime):
+        return b"datetime:" + pd.Timestamp(value).isoformat().encode()
+    if isinstance(value, datetime.date):
+        return b"date:" + value.isoformat().encode()
+    if isinstance(value, datetime.time):
+        return b"time:" + value.isoformat().encode()
+    if isinstance(value, datetime.timedelta):
+        return b"timedelta:" + str(pd.Timedelta(value).value).encode()
+    return str(value)
+
+
+def _decode_cell(value):
+    """Recupera las celdas etiquetadas por `_encode_cell`; el resto se devuelve sin cambios."""
+    if not isinstance(value, bytes):
+        return value
+    tipo, _, texto = value.partition(b":")
+    texto = texto.decode()
+    if tipo == b"datetime":
+        return pd.Timestamp(texto)
+    if tipo == b"date":
+        return datetime.date.fromisoformat(texto)
+    if tipo == b"time":
+        return datetime.time.fromisoformat(texto)
+    if tipo == b"timedelta":
+        return pd.Timedelta(int(texto))
+    return value
+
+
+def _to_rows(df, columns):
+    """Convierte las filas a tuplas de valores que SQLite puede guardar (task_id primero)."""
+    valores = {}
+    for columna in columns:
+        serie = df[columna]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            serie = serie.dt.strftime(_DATE_FORMAT)
+        elif pd.api.types.is_bool_dtype(serie):
+            serie = serie.astype(int)
+        elif pd.api.types.is_timedelta64_dtype(serie):
+            # Nanosegundos como entero, para no perder precisión
+            nanosegundos = serie.to_numpy().astype('timedelta64[ns]').astype('int64').tolist()
+            valores[columna] = [None if nulo else ns for ns, nulo in zip(nanosegundos, serie.isna().tolist())]
+            continue
+        elif serie.dtype == object:
+            # Columnas mixtas o con tipos que SQLite no admite (horas, duraciones...)
+            valores[columna] = [_encode_cell(valor) for valor in serie.tolist()]
+            continue
+        serie = serie.astype(object)
+        valores[columna] = serie.where(serie.notna(), None).tolist()
+    ids = [int(task_id) for task_id in df.index]
+    return list(zip(ids, *(valores[columna] for columna in columns)))
+
+
+class TaskStore:
+    """
+    Almacén de un plan de proyecto en SQLite, compartido por las sesiones que lo abren.
+
+    Cada plan (`dataset`, normalmente la huella del Excel subido) tiene su
+    propia tabla, de modo que subir un archivo nuevo no reemplaza el plan con
+    el que trabajan otras sesiones; las sesiones que suben el mismo archivo
+    comparten sus ediciones. El plan se ingiere una sola vez; las ediciones se
+    escriben como upserts por identificador de tarea (el índice del DataFrame)
+    y cada escritura cambia la versión del plan, que los dashboards usan para
+    saber cuándo recargar. Las columnas de `INDEXED_COLUMNS` tienen índice, de
+    modo que `query_tasks` se resuelve en la base de datos. Al ingerir un plan
+    nuevo se borran los más antiguos por encima de `TASK_STORE_MAX_DATASETS`.
+
+    Args:
+        dataset (str): Identificador del plan (p. ej. la huella del archivo de origen).
+        db_path (str): Ruta de la base de datos SQLite.
+    """
+
+    def __init__(self, dataset, db_path=TASK_STORE_DB_PATH):
+        self.dataset = dataset
+        self.db_path = db_path
+        self._table = _quote(_table_name(dataset))
+        with connect(self.db_path) as conn:
+            _ensure_schema(conn)
+
+    def _meta(self, conn):
+        """(versión, columnas) del plan, o None si no se ha ingerido."""
+        return conn.execute("SELECT version, columns FROM datasets WHERE dataset = ?", (self.dataset,)).fetchone()
+
+    def _set_meta(self, conn, version, columns):
+        conn.execute(
+            "INSERT INTO datasets (dataset, version, columns, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(dataset) DO UPDATE SET version = excluded.version, columns = excluded.columns, "
+            "updated_at = excluded.updated_at",
+            (self.dataset, version, json.dumps(columns), time.time()),
+        )
+
+    def _columns(self, conn):
+        """Columnas del plan y su tipo ('date', 'bool', 'timedelta' o 'value'), en orden."""
+        meta = self._meta(conn)
+        return json.loads(meta[1]) if meta else {}
+
+    def reserve_ids(self, count):
+        """
+        Reserva identificadores para tareas nuevas.
+
+        La secuencia es del plan y solo avanza, así que dos sesiones que añaden
+        filas a la vez no comparten identificadores y una tarea nueva nunca
+        reutiliza el de una eliminada.
+
+        Args:
+            count (int): Número de identificadores.
+
+        Returns:
+            range: Los identificadores reservados.
+        """
+        if count <= 0:
+            return range(0)
+        with connect(self.db_path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            fila = conn.execute("SELECT next_id FROM datasets WHERE dataset = ?", (self.dataset,)).fetchone()
+            if fila is None:
+                raise ValueError(f"El plan '{self.dataset}' no está en el almacén.")
+            maximo = conn.execute(f"SELECT MAX(task_id) FROM {self._table}").fetchone()[0]
+            siguiente = max(fila[0], maximo + 1 if maximo is not None else 0)
+            conn.execute("UPDATE datasets SET next_id = ? WHERE dataset = ?", (siguiente + count, self.dataset))
+        return range(siguiente, siguiente + count)
+
+    def version(self):
+        """Versión actual del plan (None si todavía no se ha ingerido)."""
+        with connect(self.db_path) as conn:
+            meta = self._meta(conn)
+        return meta[0] if meta else None
+
+    def ingest(self, df):
+        """
+        Guarda el plan (reemplazándolo si ya existía) con el contenido de un DataFrame.
+
+        Args:
+            df (pd.DataFrame): La tabla de tareas; su índice es el identificador de cada tarea.
+
+        Returns:
+            str: La nueva versión del plan.
+        """
+        df = _string_columns(df)
+        columnas = {columna: _column_kind(df[columna]) for columna in df.columns}
+        definicion = ", ".join(_quote(columna) for columna in columnas)
+        version = uuid.uuid4().hex
+        with connect(self.db_path) as conn:
+            conn.execute(f"DROP TABLE IF EXISTS {self._table}")
+            conn.execute(f"CREATE TABLE {self._table} (task_id INTEGER PRIMARY KEY, {definicion})")
+            conn.executemany(
+                f"INSERT INTO {self._table} VALUES (?, {', '.join('?' * len(columnas))})",
+                _to_rows(df, list(columnas)),
+            )
+            for i, columna in enumerate(c for c in INDEXED_COLUMNS if c in columnas):
+                indice = _quote(f"idx_{_table_name(self.dataset)}_{i}")
+                conn.execute(f"CREATE INDEX {indice} ON {self._table} ({_quote(columna)})")
+            self._set_meta(conn, version, columnas)
+            self._prune(conn)
+        return version
+
+    def _prune(self, conn):
+        """Borra los planes menos recientes por encima de `TASK_STORE_MAX_DATASETS` (nunca este)."""
+        antiguos = conn.execute(
+            "SELECT dataset FROM datasets WHERE dataset != ? ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+            (self.dataset, max(TASK_STORE_MAX_DATASETS - 1, 0)),
+        ).fetchall()
+        for (dataset,) in antiguos:
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(_table_name(dataset))}")
+            conn.execute("DELETE FROM datasets WHERE dataset = ?", (dataset,))
+
+    def apply_changes(self, upserts=None, deleted_ids=()):
+        """
+        Escribe ediciones del plan en una sola transacción.
+
+        Args:
+            upserts (pd.DataFrame, optional): Filas nuevas o modificadas, indexadas
+                por identificador de tarea. Las columnas nuevas se añaden a la tabla.
+            deleted_ids (iterable[int]): Identificadores de las tareas eliminadas.
+
+        Returns:
+            tuple[str, str | None]: La nueva versión del plan y la que reemplaza. Si
+            la anterior no es la que tenía quien escribe, otra sesión guardó cambios
+            entretanto y su copia del plan ya no está al día.
+        """
+        deleted_ids = [int(task_id) for task_id in deleted_ids]
+        version = uuid.uuid4().hex
+        with connect(self.db_path) as conn:
+            # La lectura de la versión anterior y la escritura van en la misma transacción
+            conn.execute("BEGIN IMMEDIATE")
+            meta = self._meta(conn)
+            anterior = meta[0] if meta else None
+            columnas = json.loads(meta[1]) if meta else {}
+            if upserts is not None and len(upserts):
+                upserts = _string_columns(upserts)
+                for columna in upserts.columns:
+                    if columna not in columnas:
+                        conn.execute(f"ALTER TABLE {self._table} ADD COLUMN {_quote(columna)}")
+                        columnas[columna] = _column_kind(upserts[columna])
+                nombres = list(upserts.columns)
+                asignaciones = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in nombres)
+                conn.executemany(
+                    f"INSERT INTO {self._table} (task_id, {', '.join(_quote(c) for c in nombres)}) "
+                    f"VALUES (?, {', '.join('?' * len(nombres))}) "
+                    f"ON CONFLICT(task_id) DO UPDATE SET {asignaciones}",
+                    _to_rows(upserts, nombres),
+                )
+            for chunk, placeholders in chunked(deleted_ids):
+                conn.execute(f"DELETE FROM {self._table} WHERE task_id IN ({placeholders})", chunk)
+            self._set_meta(conn, version, columnas)
+        return version, anterior
+
+    def _read(self, conn, sql, params, columnas):
+        df = pd.read_sql_query(sql, conn, params=params, index_col='task_id')
+        df.index.name = None
+        for columna, tipo in columnas.items():
+            if columna not in df.columns:
+                continue
+            if tipo == 'date':
+                df[columna] = pd.to_datetime(df[columna])
+            elif tipo == 'bool':
+                df[columna] = df[columna].fillna(0).astype(bool)
+            elif tipo == 'timedelta':
+                df[columna] = pd.to_timedelta(df[columna])
+            elif df[columna].dtype == object:
+                df[columna] = pd.Series([_decode_cell(valor) for valor in df[columna].tolist()],
+                                        index=df.index, dtype=object)
+        return compact_tasks(df)
+
+    def load(self):
+        """
+        Lee el plan completo.
+
+        La tabla se guarda en una caché en memoria por versión, así que las
+        sesiones que abren el mismo plan no vuelven a leer la base de datos.
+
+        Returns:
+            pd.DataFrame | None: La tabla de tareas, o None si el plan no se ha ingerido.
+        """
+        with connect(self.db_path) as conn:
+            meta = self._meta(conn)
+            if meta is None:
+                return None
+            version = meta[0]
+            key = (os.path.abspath(self.db_path), self.dataset, version)
+            df = _load_cache.get(key)
+            if df is None:
+                df = self._read(conn, f"SELECT * FROM {self._table} ORDER BY task_id", [], self._columns(conn))
+                _load_cache.set(key, df)
+        return df.copy()
+
+    def query_tasks(self, selections=None, exclude=None, due_before=None, columns=None):
+        """
+        Consulta tareas filtrando en la base de datos.
+
+        Args:
+            selections (dict[str, object], optional): Valor exigido por columna; None para no filtrar.
+            exclude (dict[str, object], optional): Valor a descartar por columna (p. ej. {'Estado': 'CUMPLIDA'}).
+            due_before (datetime, optional): Solo tareas con 'Fecha de fin' anterior a esta fecha.
+            columns (list[str], optional): Columnas a devolver (se omiten las que no
+                existen); por defecto, todas.
+
+        Returns:
+            pd.DataFrame: Las tareas que cumplen las condiciones, indexadas por identificador.
+        """
+        condiciones, params = [], []
+        for columna, valor in (selections or {}).items():
+            if valor is not None:
+                condiciones.append(f"{_quote(columna)} = ?")
+                params.append(valor)
+        for columna, valor in (exclude or {}).items():
+            condiciones.append(f"({_quote(columna)} IS NULL OR {_quote(columna)} != ?)")
+            params.append(valor)
+        if due_before is not None:
+            condiciones.append(f"{_quote('Fecha de fin')} < ?")
+            params.append(pd.Timestamp(due_before).strftime(_DATE_FORMAT))
+
+        with connect(self.db_path) as conn:
+            todas = self._columns(conn)
+            if not todas:
+                return pd.DataFrame()
+            seleccion = ", ".join(_quote(c) for c in (columns or todas) if c in todas)
+            where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+            sql = f"SELECT task_id, {seleccion} FROM {self._table}{where} ORDER BY task_id"
+            return self._read(conn, sql, params, todas)
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+# Columnas de texto con pocos valores distintos que se guardan como categorías
+CATEGORY_COLUMNS = ['Etapa', 'Responsable', 'Estado', 'Prioridad']
+DATE_COLUMNS = ['Fecha de inicio', 'Fecha de fin']
+# Columnas que se usan en los filtros de la barra lateral
+FILTER_COLUMNS = ['Etapa', 'Responsable', 'Estado']
+
+
+def compact_tasks(df):
+    """
+    Convierte la tabla de tareas a tipos compactos.
+
+    Las columnas de `CATEGORY_COLUMNS` pasan a `Categorical`, de modo que las
+    comparaciones de igualdad se resuelven sobre códigos enteros, y las fechas
+    se guardan como `datetime64[s]`.
+
+    Args:
+        df (pd.DataFrame): La tabla de tareas ya limpia.
+
+    Returns:
+        pd.DataFrame: El mismo DataFrame con las columnas convertidas.
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    for col in DATE_COLUMNS:
+        if col in df.columns and df[col].dtype != 'datetime64[s]':
+            df[col] = df[col].astype('datetime64[s]')
+
+    return df
+
+
+def filter_options(df, columns=FILTER_COLUMNS):
+    """
+    Precalcula los valores únicos de cada columna de filtro.
+
+    Args:
+        df (pd.DataFrame): La tabla de tareas.
+        columns (list[str]): Columnas para las que se calculan los valores.
+
+    Returns:
+        dict[str, list]: Valores únicos (sin nulos) por columna, en orden de aparición.
+    """
+    return {col: df[col].dropna().unique().tolist() for col in columns if col in df.columns}
+
+
+def build_filter_index(df, columns=FILTER_COLUMNS):
+    """
+    Construye un índice invertido por columna: valor -> posiciones de las filas.
+
+    Se calcula una sola vez por conjunto de datos. Cada lista de posiciones está
+    ordenada, por lo que cualquier combinación de filtros se resuelve
+    intersecando listas en vez de recorrer y copiar el DataFrame completo.
+
+    Args:
+        df (pd.DataFrame): La tabla de tareas.
+        columns (list[str]): Columnas a indexar.
+
+    Returns:
+        dict[str, dict]: Para cada columna, un diccionario valor -> np.ndarray de posiciones.
+    """
+    index = {}
+    for col in columns:
+        if col not in df.columns:
+            continue
+        codes, uniques = pd.factorize(df[col])
+        # Orden estable: dentro de cada valor las posiciones quedan ordenadas
+        order = np.argsort(codes, kind='stable').astype(np.int32)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        # Los nulos (código -1) quedan al principio y no se indexan
+        valid = order[len(codes) - counts.sum():]
+        index[col] = dict(zip(list(uniques), np.split(valid, np.cumsum(counts)[:-1])))
+    return index
+
+
+def select_tasks(df, index, selections):
+    """
+    Filtra la tabla de tareas usando el índice de `build_filter_index`.
+
+    Args:
+        df (pd.DataFrame): La tabla de tareas con la que se construyó el índice.
+        index (dict): El índice devuelto por `build_filter_index`.
+        selections (dict[str, object]): Valor seleccionado por columna; None para no filtrar.
+
+    Returns:
+        pd.DataFrame: Las filas que cumplen todos los filtros. Si no hay filtros
+        activos se devuelve `df` sin copiarlo.
+    """
+    listas = [index.get(col, {}).get(value, _EMPTY_POSITIONS) for col, value in selections.items() if value is not None]
+    if not listas:
+        return df
+
+    # Se interseca empezando por la lista más corta
+    listas.sort(key=len)
+    posiciones = listas[0]
+    for otra in listas[1:]:
+        posiciones = np.intersect1d(posiciones, otra, assume_unique=True)
+    return df.iloc[posiciones]
+
+
+def _editor_values(column, values):
+    """Convierte los valores que devuelve `st.data_editor` al tipo de la columna."""
+    if column in DATE_COLUMNS:
+        return pd.to_datetime(pd.Series(values, dtype=object), errors='coerce').astype('datetime64[s]').to_numpy()
+    return values
+
+
+def apply_editor_changes(df, view_index, changes, new_ids=None):
+    """
+    Aplica a la tabla completa los cambios registrados por `st.data_editor`.
+
+    Solo se tocan las celdas editadas y las filas nuevas o eliminadas; las
+    posiciones del editor se traducen a etiquetas del índice de `df` (el
+    identificador estable de cada tarea) a través de `view_index`, así que las
+    filas que no estaban a la vista por los filtros no se modifican. Las filas
+    nuevas nunca reutilizan el identificador de una fila eliminada.
+
+    Args:
+        df (pd.DataFrame): La tabla de tareas completa.
+        view_index (pd.Index): Índice de las filas mostradas en el editor, en su orden.
+        changes (dict): Estado del editor, con las claves 'edited_rows',
+            'added_rows' y 'deleted_rows'.
+        new_ids (sequence[int], optional): Identificadores para las filas nuevas, en
+            orden; por defecto, los siguientes al mayor identificador de `df`.
+
+    Returns:
+        pd.DataFrame: La tabla con los cambios aplicados.
+    """
+    editadas = changes.get('edited_rows') or {}
+    nuevas_filas = changes.get('added_rows') or []
+    eliminadas = changes.get('deleted_rows') or []
+    if new_ids is None:
+        # Se calcula antes de eliminar filas: borrar la última y añadir otra no reutiliza su identificador
+        siguiente = int(df.index.max()) + 1 if len(df) else 0
+        new_ids = range(siguiente, siguiente + len(nuevas_filas))
+    # Copia superficial: con copy-on-write solo se copian las columnas que se modifican
+    df = df.copy(deep=False)
+
+    # Celdas editadas, agrupadas por columna para asignarlas de una sola vez
+    por_columna = {}
+    for posicion, cambios in editadas.items():
+        etiqueta = view_index[int(posicion)]
+        for columna, valor in cambios.items():
+            etiquetas, valores = por_columna.setdefault(columna, ([], []))
+            etiquetas.append(etiqueta)
+            valores.append(valor)
+    for columna, (etiquetas, valores) in por_columna.items():
+        if columna not in df.columns:
+            continue
+        if isinstance(df[columna].dtype, pd.CategoricalDtype):
+            nuevas = set(valores).difference(df[columna].cat.categories).difference([None])
+            if nuevas:
+                df[columna] = df[columna].cat.add_categories(sorted(nuevas))
+        df.loc[etiquetas, columna] = _editor_values(columna, valores)
+
+    if eliminadas:
+        df = df.drop(index=view_index[[int(posicion) for posicion in eliminadas]])
+
+    if nuevas_filas:
+        filas = pd.DataFrame(nuevas_filas, index=pd.Index(new_ids, dtype=df.index.dtype), columns=df.columns)
+        for columna in DATE_COLUMNS:
+            if columna in filas.columns:
+                filas[columna] = _editor_values(columna, filas[columna].tolist())
+        # Las casillas que el usuario no marcó en las filas nuevas quedan en False
+        for columna in df.columns[df.dtypes == bool]:
+            filas[columna] = filas[columna].fillna(False).astype(bool)
+        df = compact_tasks(pd.concat([df, filas]))
+
+    return df
+
+
+
+def editor_changed_ids(view_index, changes, new_ids):
+    """
+    Identificadores de las tareas que toca una edición de `st.data_editor`.
+
+    Se calculan a partir del propio delta del editor (no comparando índices),
+    así que una fila nueva nunca se confunde con una eliminada.
+
+    Args:
+        view_index (pd.Index): Índice de las filas mostradas en el editor, en su orden.
+        changes (dict): Estado del editor, como en `apply_editor_changes`.
+        new_ids (sequence[int]): Identificadores asignados a las filas nuevas.
+
+    Returns:
+        tuple[list[int], list[int]]: Las tareas editadas o añadidas y las eliminadas.
+    """
+    eliminadas = [view_index[int(posicion)] for posicion in changes.get('deleted_rows') or []]
+    editadas = [view_index[int(posicion)] for posicion in changes.get('edited_rows') or {}]
+    # Una fila editada y eliminada en la misma edición solo se elimina
+    descartadas = set(eliminadas)
+    modificadas = [task_id for task_id in editadas if task_id not in descartadas] + list(new_ids)
+    return modificadas, eliminadas
+
+
+_EMPTY_POSITIONS = np.array([], dtype=np.int32)
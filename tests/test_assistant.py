@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from assistant import ask_stream, build_context, collect_chunks, question_keywords, relevant_rows
+from response_cache import ResponseCache
+
+HOY = pd.Timestamp("2024-06-01")
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Modelo de prueba: devuelve `chunks` por streaming y, si se indica, falla tras `fail_after` fragmentos."""
+
+    model_name = "modelo-de-prueba"
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False):
+        assert stream
+        self.prompts.append(prompt)
+
+        def fragmentos():
+            for i, texto in enumerate(self.chunks):
+                if i == self.fail_after:
+                    raise ConnectionError("stream interrumpido")
+                yield Chunk(texto)
+        return fragmentos()
+
+
+@pytest.fixture
+def plan():
+    n = 3000
+    return pd.DataFrame({
+        'Hito/Actividad': [f"Revisar contrato {i}" if i % 7 == 0 else f"Actividad {i}" for i in range(n)],
+        'Fecha de fin': pd.to_datetime("2024-01-01") + pd.to_timedelta(np.arange(n) % 200, 'D'),
+        'Estado': pd.Categorical(np.where(np.arange(n) % 3 == 0, "CUMPLIDA", "ATRASADA")),
+        'Etapa': pd.Categorical([f"Etapa {i % 40}" for i in range(n)]),
+        'Responsable': pd.Categorical([f"Persona {i % 60}" for i in range(n)]),
+    })
+
+
+@pytest.mark.parametrize("presupuesto", [50, 200, 1000, 3000])
+def test_context_respects_token_budget(plan, presupuesto):
+    contexto = build_context(plan, "¿Qué contratos están atrasados?", data_version="v1",
+                             token_budget=presupuesto, reference_date=HOY)
+    assert len(contexto) <= presupuesto * 4
+    assert contexto.startswith("## Resumen de los datos\nTotal de registros: 3000")
+
+
+def test_context_lists_rows_matching_keywords(plan):
+    contexto = build_context(plan, "¿Qué pasa con Revisar contrato 1400?", data_version="v1",
+                             token_budget=1000, reference_date=HOY)
+    filas = contexto.split("## Registros relacionados con la pregunta")[1].splitlines()[2:]
+    # Primero la fila que coincide con más palabras; el resto, solo contratos
+    assert filas[0].startswith("Revisar contrato 1400 |")
+    assert all(f.startswith("Revisar contrato") or f.startswith("...") for f in filas)
+    assert filas[-1].startswith("... (")
+
+
+def test_relevant_rows_rank_by_matches(plan):
+    filas = relevant_rows(plan, question_keywords("contrato de la Etapa 0"))
+    assert filas.iloc[0]['Hito/Actividad'].startswith("Revisar contrato")
+    assert filas.iloc[0]['Etapa'] == "Etapa 0"
+    assert not relevant_rows(plan, question_keywords("¿qué hay?")).size
+
+
+def test_stream_is_cached_once_complete(plan):
+    cache = ResponseCache(db_path=None)
+    modelo = FakeModel(["Hay ", "muchos ", "contratos."])
+    primera = list(ask_stream(modelo, plan, "¿Qué contratos hay?", "v1", cache=cache))
+    segunda = list(ask_stream(modelo, plan, "que contratos hay", "v1", cache=cache))
+
+    assert primera == ["Hay ", "muchos ", "contratos."]
+    assert segunda == ["Hay muchos contratos."]
+    assert len(modelo.prompts) == 1
+
+
+def test_broken_stream_keeps_partial_text_and_is_not_cached(plan):
+    cache = ResponseCache(db_path=None)
+    modelo = FakeModel(["Hay ", "muchos ", "contratos."], fail_after=2)
+    fragmentos = []
+    with pytest.raises(ConnectionError):
+        for _ in collect_chunks(ask_stream(modelo, plan, "¿Qué contratos hay?", "v1", cache=cache), fragmentos):
+            pass
+
+    assert "".join(fragmentos) == "Hay muchos "
+    # La respuesta interrumpida no se reutiliza: la siguiente pregunta vuelve a llamar al modelo
+    modelo.fail_after = None
+    assert list(ask_stream(modelo, plan, "¿Qué contratos hay?", "v1", cache=cache)) == ["Hay ", "muchos ", "contratos."]
+    assert len(modelo.prompts) == 2
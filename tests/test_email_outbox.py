@@ -0,0 +1,146 @@
+import datetime
+import email
+import socket
+import time
+
+import pytest
+
+from email_outbox import FAILED, PENDING, SENDING, SENT, EmailOutbox
+
+VENCE = datetime.datetime(2024, 6, 1)
+
+
+def _reminder(i):
+    return {"receiver_email": f"persona{i}@example.com", "task_name": f"Tarea {i}",
+            "responsible_name": f"Persona {i}", "due_date": VENCE, "task_key": i}
+
+
+def _wait_for(condition, timeout=10):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class FakeSender:
+    """Falla con un error transitorio las primeras `failures` llamadas y luego envía."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    def __call__(self, reminders):
+        self.calls.append((time.monotonic(), [r["task_name"] for r in reminders]))
+        if len(self.calls) <= self.failures:
+            return [{"success": False, "error": "SMTP 421", "retryable": True} for _ in reminders]
+        return [{"success": True} for _ in reminders]
+
+
+@pytest.fixture
+def smtp_sink(monkeypatch):
+    """Servidor SMTP local (aiosmtpd) que guarda los mensajes recibidos."""
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+
+    class Sink:
+        def __init__(self):
+            self.messages = []
+
+        async def handle_DATA(self, server, session, envelope):
+            self.messages.append(email.message_from_bytes(envelope.content))
+            return "250 OK"
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        puerto = s.getsockname()[1]
+    sink = Sink()
+    controller = controller_module.Controller(sink, hostname="127.0.0.1", port=puerto)
+    controller.start()
+    monkeypatch.setenv("EMAIL_SENDER", "gestor@example.com")
+    monkeypatch.setenv("SMTP_USE_SSL", "false")
+    monkeypatch.setenv("SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(puerto))
+    monkeypatch.delenv("SMTP_USERNAME", raising=False)
+    yield sink
+    controller.stop()
+
+
+def test_delivers_queued_mail_to_smtp_server(tmp_path, smtp_sink):
+    estados = []
+    outbox = EmailOutbox(str(tmp_path / "outbox.db"), batch_size=2, poll_interval=0.05,
+                         on_status=lambda reminders, statuses: estados.extend(statuses))
+    ids = outbox.enqueue([_reminder(i) for i in range(5)])
+    outbox.start()
+    try:
+        assert _wait_for(lambda: outbox.counts() == {SENT: 5})
+    finally:
+        outbox.stop()
+
+    assert set(outbox.statuses(ids).values()) == {SENT}
+    assert sorted(m["To"] for m in smtp_sink.messages) == [f"persona{i}@example.com" for i in range(5)]
+    assert estados == [SENT] * 5
+
+
+def test_transient_failure_is_retried_with_backoff(tmp_path):
+    sender = FakeSender(failures=2)
+    estados = []
+    outbox = EmailOutbox(str(tmp_path / "outbox.db"), backoff_base=0.1, poll_interval=0.02, sender=sender,
+                         on_status=lambda reminders, statuses: estados.extend(statuses))
+    outbox.enqueue([_reminder(1)])
+    outbox.start()
+    try:
+        assert _wait_for(lambda: outbox.counts() == {SENT: 1})
+    finally:
+        outbox.stop()
+
+    assert estados == [PENDING, PENDING, SENT]
+    momentos = [momento for momento, _ in sender.calls]
+    # La espera se duplica en cada intento: 0.1 s y luego 0.2 s
+    assert momentos[1] - momentos[0] >= 0.1
+    assert momentos[2] - momentos[1] >= 0.2
+
+
+def test_gives_up_after_max_attempts(tmp_path):
+    outbox = EmailOutbox(str(tmp_path / "outbox.db"), max_attempts=2, backoff_base=0.01, poll_interval=0.02,
+                         sender=FakeSender(failures=10))
+    outbox.enqueue([_reminder(1)])
+    outbox.start()
+    try:
+        assert _wait_for(lambda: outbox.counts() == {FAILED: 1})
+    finally:
+        outbox.stop()
+
+
+def test_pending_mail_survives_restart(tmp_path):
+    ruta = str(tmp_path / "outbox.db")
+    EmailOutbox(ruta).enqueue([_reminder(1), _reminder(2)])
+
+    sender = FakeSender()
+    reiniciada = EmailOutbox(ruta, poll_interval=0.02, sender=sender)
+    reiniciada.start()
+    try:
+        assert _wait_for(lambda: reiniciada.counts() == {SENT: 2})
+    finally:
+        reiniciada.stop()
+    assert [nombres for _, nombres in sender.calls] == [["Tarea 1", "Tarea 2"]]
+
+
+def test_second_instance_does_not_resend_leased_batch(tmp_path):
+    ruta = str(tmp_path / "outbox.db")
+    primera = EmailOutbox(ruta, lease_seconds=0.5)
+    primera.enqueue([_reminder(1)])
+    assert len(primera._claim_batch()) == 1
+
+    # Otra instancia sobre la misma base (otro proceso o una caché reconstruida)
+    sender = FakeSender()
+    segunda = EmailOutbox(ruta, poll_interval=0.02, sender=sender)
+    segunda.start()
+    try:
+        time.sleep(0.2)
+        assert sender.calls == [] and segunda.counts() == {SENDING: 1}
+        # Cuando la concesión vence (el envío se interrumpió), el lote vuelve a reclamarse
+        assert _wait_for(lambda: segunda.counts() == {SENT: 1})
+    finally:
+        segunda.stop()
+    assert len(sender.calls) == 1
@@ -0,0 +1,66 @@
+import datetime
+import email
+import socket
+import time
+
+from email_sender import build_digest_message, build_reminder_message, send_bulk_reminders
+
+VENCE = datetime.datetime(2024, 6, 1)
+
+
+def _parse(raw):
+    message = email.message_from_string(raw)
+    assert not message.defects
+    return message
+
+
+def test_line_breaks_in_task_name_stay_in_the_subject():
+    raw = build_reminder_message("gestor@example.com", "ana@example.com",
+                                 "Revisar\r\nBcc: intruso@example.com\nplan", "Ana", VENCE)
+    message = _parse(raw)
+    assert message["Subject"] == "Recordatorio: Tarea Pendiente - Revisar Bcc: intruso@example.com plan"
+    assert message["Bcc"] is None
+    assert message["To"] == "ana@example.com"
+    assert message["From"] == "Gestor de Proyectos <gestor@example.com>"
+
+
+def test_non_ascii_subject_with_line_break_is_encoded_on_one_header():
+    raw = build_reminder_message("gestor@example.com", "ana@example.com", "Diseño\ndel piloto", "Ana", VENCE)
+    message = _parse(raw)
+    asunto = str(email.header.make_header(email.header.decode_header(message["Subject"])))
+    assert asunto == "Recordatorio: Tarea Pendiente - Diseño del piloto"
+    assert message["To"] == "ana@example.com"
+
+
+def test_digest_headers_are_well_formed():
+    raw = build_digest_message("gestor@example.com", "ana@example.com", "Ana",
+                               [{"task_name": "Cerrar\ncontrato", "due_date": VENCE, "overdue": True}])
+    assert _parse(raw)["Subject"] == "Recordatorio: 1 Tarea(s) Pendiente(s)"
+
+
+def test_receiver_with_line_break_is_rejected(monkeypatch):
+    monkeypatch.setenv("EMAIL_SENDER", "gestor@example.com")
+    monkeypatch.setenv("SMTP_USE_SSL", "false")
+    resultado, = send_bulk_reminders([{"receiver_email": "ana@example.com\r\nRCPT TO:<x@example.com>",
+                                       "task_name": "Tarea", "responsible_name": "Ana", "due_date": VENCE}])
+    assert not resultado["success"] and not resultado["retryable"]
+
+
+def test_hung_server_times_out(monkeypatch):
+    # Un servidor que acepta la conexión pero nunca saluda
+    servidor = socket.socket()
+    servidor.bind(("127.0.0.1", 0))
+    servidor.listen()
+    monkeypatch.setenv("EMAIL_SENDER", "gestor@example.com")
+    monkeypatch.setenv("SMTP_USE_SSL", "false")
+    monkeypatch.setenv("SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(servidor.getsockname()[1]))
+    monkeypatch.setenv("SMTP_TIMEOUT", "0.2")
+    try:
+        inicio = time.monotonic()
+        resultado, = send_bulk_reminders([{"receiver_email": "ana@example.com", "task_name": "Tarea",
+                                           "responsible_name": "Ana", "due_date": VENCE}], max_retries=0)
+    finally:
+        servidor.close()
+    assert time.monotonic() - inicio < 5
+    assert not resultado["success"] and resultado["retryable"]
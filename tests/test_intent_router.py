@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from assistant import PROGRAMS_SCHEMA
+from intent_router import route_question
+
+HOY = pd.Timestamp("2024-06-01")
+
+
+@pytest.fixture
+def tareas():
+    return pd.DataFrame({
+        'Hito/Actividad': ["Aprobar presupuesto", "Contratar equipo", "Diseñar piloto", "Cerrar contrato"],
+        'Fecha de fin': pd.to_datetime(["2024-05-01", "2024-05-15", "2024-07-01", "2024-04-01"]),
+        'Estado': pd.Categorical(["ATRASADA", "A TIEMPO", "A TIEMPO", "CUMPLIDA"]),
+        'Etapa': pd.Categorical(["Diseño", "Ejecución", "Diseño", "Cierre"]),
+        'Responsable': pd.Categorical(["Ana", "Luis", "Ana", "Luis"]),
+    })
+
+
+@pytest.mark.parametrize("pregunta", [
+    "¿Qué tareas no están vencidas?",
+    "¿Quién es responsable de Aprobar presupuesto?",
+    "¿Qué porcentaje de tareas de Ana están cumplidas?",
+    "¿Cuál es el promedio de tareas por responsable?",
+    "¿Qué tareas hay sin responsable?",
+    "¿Cuándo vence Contratar equipo?",
+    "¿Por qué Ana tiene tareas atrasadas?",
+    "¿Qué tareas de Ana están vencidas o a tiempo?",
+    "¿Qué tareas tienen Ana o Luis en la etapa Diseño?",
+    "¿Qué etapa tiene más tareas atrasadas?",
+    "¿Quién tiene menos tareas cumplidas?",
+    "¿Cuál es el responsable con mayor número de tareas?",
+])
+def test_falls_back_to_model(tareas, pregunta):
+    assert route_question(tareas, pregunta, reference_date=HOY) is None
+
+
+def test_overdue_tasks(tareas):
+    respuesta = route_question(tareas, "¿Qué tareas están vencidas?", reference_date=HOY)
+    assert respuesta.startswith("Hay **2** registros")
+    assert "Aprobar presupuesto" in respuesta and "Contratar equipo" in respuesta
+    assert "Cerrar contrato" not in respuesta
+
+
+def test_counts_per_responsable(tareas):
+    respuesta = route_question(tareas, "¿Cuántas tareas hay por responsable?", reference_date=HOY)
+    assert "- Ana: 2" in respuesta and "- Luis: 2" in respuesta
+
+
+def test_tasks_by_value(tareas):
+    respuesta = route_question(tareas, "¿Qué tareas tiene Ana en la etapa Diseño?", reference_date=HOY)
+    assert respuesta.startswith("Hay **2** registros")
+
+
+def test_programs_in_red():
+    programas = pd.DataFrame({
+        'Actividad': ["Taller", "Visita", "Inducción"],
+        'Fecha Límite': pd.to_datetime(["2024-07-01", "2024-07-01", "2024-07-01"]),
+        'Estado': pd.Categorical(["Rojo", "Verde", "Rojo"]),
+        'Programa': ["Ciberpaz", "Smartfilms", "Legado de Gabo"],
+        'Porcentaje Ejecución': [10.0, 90.0, 5.0],
+    })
+    respuesta = route_question(programas, "¿Qué programas están en rojo?", PROGRAMS_SCHEMA, reference_date=HOY)
+    assert "Ciberpaz" in respuesta and "Legado de Gabo" in respuesta and "Smartfilms" not in respuesta
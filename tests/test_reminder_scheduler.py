@@ -0,0 +1,75 @@
+import pandas as pd
+
+from email_outbox import SENT
+from reminder_ledger import RETRYING, ReminderLedger
+from reminder_scheduler import ReminderScheduler
+
+AHORA = pd.Timestamp("2024-06-01 09:00").value // 10**9
+
+
+class FlakySender:
+    """Falla con un error transitorio las primeras `failures` veces y luego envía."""
+
+    def __init__(self, failures=1):
+        self.failures = failures
+        self.calls = []
+
+    def __call__(self, reminders):
+        self.calls.append([r["task_name"] for r in reminders])
+        if len(self.calls) <= self.failures:
+            return [{"success": False, "error": "SMTP 421", "retryable": True} for _ in reminders]
+        return [{"success": True} for _ in reminders]
+
+
+def _plan():
+    return pd.DataFrame({
+        'Hito/Actividad': ["Aprobar presupuesto"],
+        'Responsable': ["Ana"],
+        'Fecha de fin': pd.to_datetime(["2024-06-02 09:00"]),
+        'Estado': ["A TIEMPO"],
+        'Email': ["ana@example.com"],
+    })
+
+
+def _scheduler(tmp_path, sender):
+    ledger = ReminderLedger(str(tmp_path / "ledger.db"))
+    return ReminderScheduler(None, lead_days=1, retry_delay=60, ledger=ledger, sender=sender), ledger
+
+
+def test_transient_failure_is_retried_until_sent(tmp_path):
+    sender = FlakySender(failures=1)
+    scheduler, ledger = _scheduler(tmp_path, sender)
+    scheduler.load_tasks(_plan(), now=AHORA)
+
+    assert scheduler.dispatch_due(now=AHORA) == 0
+    assert list(ledger.counts()) == [RETRYING]
+    assert scheduler.seconds_until_next(now=AHORA) == 60
+
+    assert scheduler.dispatch_due(now=AHORA + 60) == 1
+    assert ledger.counts() == {SENT: 1}
+    assert sender.calls == [["Aprobar presupuesto"], ["Aprobar presupuesto"]]
+    assert len(scheduler) == 0
+
+
+def test_retry_survives_restart(tmp_path):
+    scheduler, ledger = _scheduler(tmp_path, FlakySender(failures=1))
+    scheduler.load_tasks(_plan(), now=AHORA)
+    scheduler.dispatch_due(now=AHORA)
+
+    # Un programador nuevo (p. ej. tras un reinicio) retoma el recordatorio a reintentar
+    sender = FlakySender(failures=0)
+    reiniciado = ReminderScheduler(None, lead_days=1, ledger=ledger, sender=sender)
+    reiniciado.load_tasks(_plan(), now=AHORA + 60)
+    assert reiniciado.dispatch_due(now=AHORA + 60) == 1
+    assert ledger.counts() == {SENT: 1}
+
+
+def test_sent_reminder_is_not_repeated(tmp_path):
+    sender = FlakySender(failures=0)
+    scheduler, _ = _scheduler(tmp_path, sender)
+    scheduler.load_tasks(_plan(), now=AHORA)
+    assert scheduler.dispatch_due(now=AHORA) == 1
+
+    scheduler.load_tasks(_plan(), now=AHORA + 60)
+    assert scheduler.dispatch_due(now=AHORA + 60) == 0
+    assert len(sender.calls) == 1
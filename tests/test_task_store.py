@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+import task_store
+from task_store import TaskStore, list_datasets
+from task_table import apply_editor_changes, editor_changed_ids
+
+
+@pytest.fixture
+def tareas():
+    return pd.DataFrame({
+        'Hito/Actividad': ["Aprobar presupuesto", "Contratar equipo", "Diseñar piloto", "Cerrar contrato"],
+        'Fecha de fin': pd.to_datetime(["2024-05-01", "2024-05-15", "2024-07-01", "2024-04-01"]),
+        'Estado': ["ATRASADA", "A TIEMPO", "A TIEMPO", "CUMPLIDA"],
+        'Responsable': ["Ana", "Luis", "Ana", "Luis"],
+        'Notificación Enviada': [False, True, False, False],
+    }, index=[3, 5, 7, 8])
+
+
+@pytest.fixture
+def tienda(tmp_path, tareas):
+    tienda = TaskStore("plan", str(tmp_path / "tasks.db"))
+    tienda.ingest(tareas)
+    return tienda
+
+
+def _guardar(tienda, df, view_index, cambios):
+    """Mismo flujo que el botón "Guardar Cambios en la Tabla"."""
+    nuevos_ids = tienda.reserve_ids(len(cambios.get('added_rows') or []))
+    df = apply_editor_changes(df, view_index, cambios, nuevos_ids)
+    modificadas, eliminadas = editor_changed_ids(view_index, cambios, nuevos_ids)
+    tienda.apply_changes(df.loc[modificadas], deleted_ids=eliminadas)
+    return df
+
+
+def _comparables(df):
+    return df.sort_index().astype({'Estado': str, 'Responsable': str})
+
+
+def test_delete_last_and_add_round_trip(tienda):
+    df = tienda.load()
+    cambios = {
+        'edited_rows': {1: {'Estado': "CUMPLIDA"}},
+        'added_rows': [{'Hito/Actividad': "Lanzar piloto", 'Fecha de fin': "2024-08-01",
+                        'Estado': "A TIEMPO", 'Responsable': "Eva"}],
+        'deleted_rows': [3],
+    }
+    df = _guardar(tienda, df, df.index, cambios)
+
+    assert 8 not in df.index and df.index.max() == 9
+    guardado = tienda.load()
+    pd.testing.assert_frame_equal(_comparables(guardado), _comparables(df), check_categorical=False)
+    assert guardado.loc[9, 'Hito/Actividad'] == "Lanzar piloto"
+    assert guardado.loc[5, 'Estado'] == "CUMPLIDA"
+
+
+def test_filtered_view_edits_only_visible_rows(tienda):
+    df = tienda.load()
+    vista = df[df['Responsable'] == "Ana"].index
+    df = _guardar(tienda, df, vista, {'edited_rows': {1: {'Responsable': "Eva"}}, 'deleted_rows': [0]})
+
+    guardado = tienda.load()
+    assert guardado.index.tolist() == [5, 7, 8]
+    assert guardado.loc[7, 'Responsable'] == "Eva"
+    pd.testing.assert_frame_equal(_comparables(guardado), _comparables(df), check_categorical=False)
+
+
+def test_reserved_ids_are_never_reused(tienda):
+    primeros = tienda.reserve_ids(2)
+    tienda.apply_changes(deleted_ids=[8])
+    assert list(primeros) == [9, 10]
+    assert list(tienda.reserve_ids(1)) == [11]
+
+
+def test_apply_changes_reports_concurrent_writes(tienda):
+    base = tienda.version()
+    version, anterior = tienda.apply_changes(deleted_ids=[3])
+    assert anterior == base
+
+    # Otra sesión que partía de `base` detecta que su copia ya no está al día
+    _, anterior = tienda.apply_changes(deleted_ids=[5])
+    assert anterior == version != base
+
+
+def test_ingest_prunes_oldest_plans(tmp_path, tareas, monkeypatch):
+    monkeypatch.setattr(task_store, "TASK_STORE_MAX_DATASETS", 2)
+    ruta = str(tmp_path / "tasks.db")
+    for plan in ("enero", "febrero", "marzo"):
+        TaskStore(plan, ruta).ingest(tareas)
+
+    assert list(list_datasets(ruta)) == ["marzo", "febrero"]
+    assert TaskStore("enero", ruta).load() is None